@@ -0,0 +1,137 @@
+'''
+MIT License
+
+Copyright (c) 2025 VT-Tuzki
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import argparse
+import io
+import json
+import time
+
+from model_1s_generator import generate_model
+from model_1s_to_obj import Model1SToOBJ, module
+
+# (名称, 模块数, 每个模块的顶点数, 每个模块的面片数)
+MODEL_SIZES = [
+    ("small", 8, 200, 300),
+    ("medium", 16, 2000, 4000),
+    ("large", 32, 20000, 40000),
+]
+# 贴图边长(像素)
+TEXTURE_SIZES = [256, 1024, 2048]
+
+def measure(func, repeat):
+    """Run func `repeat` times and return the best wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def decode_all(converter, data):
+    return [model_obj for _, model_obj in converter.iter_modules(data)]
+
+def benchmark_model(name, module_count, vertex_count, face_count, repeat):
+    """Time header scan, decoding and OBJ writing on one synthetic model."""
+    data = generate_model(module_count=module_count, vertex_count=vertex_count,
+                          face_count=face_count, seed=0)
+    converter = Model1SToOBJ()
+    scalar_converter = Model1SToOBJ(bulk_decode=False)
+    modules = decode_all(converter, data)
+    # 各模块的入口偏移, 用于单独测量process_module
+    offsets = [offset for offset, _ in converter.iter_modules(data)]
+
+    def write_vertices():
+        obj_file = io.StringIO()
+        for module_info in modules:
+            converter._write_vertex(obj_file, module_info)
+
+    def write_faces():
+        obj_file = io.StringIO()
+        for module_info in modules:
+            converter._write_faces(obj_file, module_info)
+
+    timings = {
+        "header_scan": measure(lambda: converter.scan_headers(data), repeat),
+        "process_module": measure(
+            lambda: [converter.process_module(data, offset, False, module()) for offset in offsets], repeat),
+        "process_module_scalar": measure(
+            lambda: [scalar_converter.process_module(data, offset, False, module()) for offset in offsets],
+            repeat),
+        "_write_vertex": measure(write_vertices, repeat),
+        "_write_faces": measure(write_faces, repeat),
+    }
+    return {"model": name, "bytes": len(data), "modules": module_count,
+            "vertices": module_count * vertex_count, "faces": module_count * face_count,
+            "seconds": timings}
+
+def benchmark_texture(size, repeat):
+    """Time convert_magenta_to_transparent on a size x size texture in memory."""
+    from PIL import Image
+
+    img = Image.new("RGB", (size, size), (40, 80, 120))
+    # 左半边为洋红色, 需要转换为透明
+    img.paste((255, 0, 255), (0, 0, size // 2, size))
+    source = io.BytesIO()
+    img.save(source, "PNG")
+    png = source.getvalue()
+    converter = Model1SToOBJ()
+
+    def convert():
+        converter.convert_magenta_to_transparent(io.BytesIO(png), io.BytesIO())
+
+    return {"texture": f"{size}x{size}", "bytes": len(png),
+            "seconds": {"convert_magenta_to_transparent": measure(convert, repeat)}}
+
+def print_results(results):
+    for result in results:
+        label = result.get("model") or result.get("texture")
+        print(f"\n[{label}] {result['bytes']} bytes"
+              + (f", {result['vertices']} vertices, {result['faces']} faces" if "vertices" in result else ""))
+        for stage, seconds in result["seconds"].items():
+            print(f"  {stage:<28} {seconds * 1000:10.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model.1s parsing, OBJ export and textures.")
+    parser.add_argument("--sizes", nargs="+", choices=[size[0] for size in MODEL_SIZES],
+                        default=[size[0] for size in MODEL_SIZES], help="model sizes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--no-textures", action="store_true", help="skip the texture benchmark")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for name, module_count, vertex_count, face_count in MODEL_SIZES:
+        if name in args.sizes:
+            results.append(benchmark_model(name, module_count, vertex_count, face_count, args.repeat))
+    if not args.no_textures:
+        for size in TEXTURE_SIZES:
+            results.append(benchmark_texture(size, args.repeat))
+
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
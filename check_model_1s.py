@@ -0,0 +1,129 @@
+'''
+MIT License
+
+Copyright (c) 2025 VT-Tuzki
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+
+from model_1s_generator import generate_model
+from model_1s_to_obj import Model1SToOBJ, convert_directory, parse_bytes
+
+def check_decoders():
+    """Bulk and scalar (bulk_decode=False) decoding give identical modules on synthetic models."""
+    for nesting in (0, 1, 2):
+        data = generate_model(module_count=5, vertex_count=60, face_count=80, uv_count=70,
+                              nesting=nesting, seed=nesting)
+        decoded = []
+        for bulk_decode in (True, False):
+            converter = Model1SToOBJ(bulk_decode=bulk_decode)
+            decoded.append([(offset, model_obj.id, model_obj.name, model_obj.sub_id, model_obj.transform,
+                             list(model_obj.vertex), list(model_obj.normals), list(model_obj.uvs),
+                             list(model_obj.faces))
+                            for offset, model_obj in converter.iter_modules(data)])
+        assert decoded[0] == decoded[1], f"nesting={nesting}: 批量解码与逐值解码结果不同"
+        assert len(decoded[0]) == 5, f"nesting={nesting}: 模块数 {len(decoded[0])}"
+
+def _write_png(path, color):
+    from PIL import Image
+    Image.new("RGB", (4, 4), color).save(path, "PNG")
+
+def check_manifest_cleanup():
+    """
+    Outputs a run no longer produces are deleted, and nothing else.
+
+    Runs convert_directory on a generated vehicle while switching --format,
+    adding and dropping --lod levels and removing an input, and compares the
+    output directory with the exact expected file list after every run.
+    """
+    data = generate_model(module_count=3, vertex_count=200, face_count=300, seed=1)
+    objs = {f"{model_obj.name}_{model_obj.id}.obj" for model_obj in parse_bytes(data).modules}
+    lod = lambda level: {name[:-4] + f"_lod{level}.obj" for name in objs}
+
+    with tempfile.TemporaryDirectory() as root:
+        source_dir = os.path.join(root, "kart")
+        os.makedirs(source_dir)
+        with open(os.path.join(source_dir, "model.1s"), 'wb') as f:
+            f.write(data)
+        _write_png(os.path.join(source_dir, "0.png"), (40, 80, 120))
+        _write_png(os.path.join(source_dir, "1.png"), (255, 0, 255))
+        _write_png(os.path.join(source_dir, "shadow.png"), (0, 0, 0))
+        output_path = os.path.join(source_dir, "kart_module")
+        textures = {"0.png", "1.png", "shadow.png"}
+
+        # (说明, convert_directory参数, 之后输出目录中应有的文件)
+        steps = [
+            ("obj", dict(), objs | {"test.mtl"} | textures),
+            ("glb --incremental", dict(incremental=True, output_format="glb"), {"model.glb"} | textures),
+            ("obj --lod 0.5 0.25", dict(lod_ratios=(0.5, 0.25)), objs | lod(1) | lod(2) | {"test.mtl"} | textures),
+            ("obj --lod 0.5 --incremental", dict(incremental=True, lod_ratios=(0.5,)),
+             objs | lod(1) | {"test.mtl"} | textures),
+            ("obj --incremental", dict(incremental=True), objs | {"test.mtl"} | textures),
+            ("obj --incremental (unchanged)", dict(incremental=True), objs | {"test.mtl"} | textures),
+            ("merged --bounds", dict(output_format="merged", bounds=True),
+             {"model.obj", "bounds.json", "test.mtl"} | textures),
+        ]
+        for label, kwargs, expected in steps:
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert_directory(source_dir, **kwargs)
+            found = set(os.listdir(output_path)) - {"manifest.json"}
+            assert found == expected, f"{label}: 多出 {sorted(found - expected)}, 缺少 {sorted(expected - found)}"
+
+        # 删除的输入, 其输出也应被删除
+        os.remove(os.path.join(source_dir, "shadow.png"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_directory(source_dir, incremental=True, output_format="merged", bounds=True)
+        found = set(os.listdir(output_path)) - {"manifest.json"}
+        expected = {"model.obj", "bounds.json", "test.mtl", "0.png", "1.png"}
+        assert found == expected, f"删除shadow.png后: 多出 {sorted(found - expected)}, 缺少 {sorted(expected - found)}"
+
+CHECKS = [check_decoders, check_manifest_cleanup]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the converter self-checks on synthetic models.")
+    names = [check.__name__ for check in CHECKS]
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run: {', '.join(names)} (default: all)")
+    args = parser.parse_args()
+    for name in args.checks:
+        if name not in names:
+            parser.error(f"unknown check: {name}")
+    logging.basicConfig(level=logging.ERROR)
+
+    failures = 0
+    for check in CHECKS:
+        if args.checks and check.__name__ not in args.checks:
+            continue
+        try:
+            check()
+            print(f"ok    {check.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL  {check.__name__}: {e}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
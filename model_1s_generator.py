@@ -0,0 +1,167 @@
+'''
+MIT License
+
+Copyright (c) 2025 VT-Tuzki
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import argparse
+import math
+import random
+import struct
+
+from model_1s_to_obj import Model1SToOBJ
+
+# 面片中未使用的索引(d, e, f)在样例文件里为0xFFFF
+NO_INDEX = 0xFFFF
+
+def _string(name):
+    """名称: 2B字符数 + 2B终止符 + UTF-16LE字符"""
+    return struct.pack('<HH', len(name), 0) + name.encode('utf-16le')
+
+def _matrix(rng, angle=0.0, translation=(0.0, 0.0, 0.0)):
+    """84B矩阵: 3x3旋转(绕Z轴) + 平移(9-11) + 其余参数"""
+    c, s = math.cos(angle), math.sin(angle)
+    floats = [c, -s, 0.0,
+              s, c, 0.0,
+              0.0, 0.0, 1.0,
+              *translation,
+              1.0, 1.0, 1.0, 1.0,
+              rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1),
+              rng.uniform(-1, 1), rng.uniform(-1, 1)]
+    return struct.pack('<21f', *floats)
+
+def _geometry(rng, vertex_count, face_count, uv_count):
+    """0xAA27 几何数据块: 顶点, 法线, UV, 面片"""
+    parts = [Model1SToOBJ.VERTEX_COORDINATES_HEADER,
+             struct.pack('<HHH', 0, vertex_count, 0)]
+    parts.append(struct.pack(f'<{vertex_count * 3}f',
+                             *(rng.uniform(-1, 1) for _ in range(vertex_count * 3))))
+
+    normals = []
+    for _ in range(vertex_count):
+        x, y, z = rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1)
+        length = math.sqrt(x * x + y * y + z * z) or 1.0
+        normals += [x / length, y / length, z / length]
+    parts.append(struct.pack('<I', vertex_count))
+    parts.append(struct.pack(f'<{vertex_count * 3}f', *normals))
+
+    parts.append(struct.pack('<HH', uv_count, 0))
+    parts.append(b''.join(struct.pack('<2H2f', i % max(vertex_count, 1), 0, rng.random(), rng.random())
+                          for i in range(uv_count)))
+
+    parts.append(struct.pack('<HH', face_count, 0))
+    faces = []
+    for _ in range(face_count):
+        g, h, i = (rng.randrange(vertex_count) for _ in range(3))
+        a, b, c = (rng.randrange(uv_count) for _ in range(3))
+        faces.append(struct.pack('<10H', a, b, c, NO_INDEX, NO_INDEX, NO_INDEX, g, h, i, 0))
+    parts.append(b''.join(faces))
+    return b''.join(parts)
+
+def build_module(rng, header, module_id, name, vertex_count, face_count, uv_count=None, nesting=0):
+    """
+    Build the bytes of one module as process_module reads them.
+
+    Args:
+        rng: random.Random used for all generated values
+        header: 6-byte header the module starts with (MODEL_HEADER or BASE_MODEL_HEADER)
+        module_id: id of the outermost level; nested levels use the following ids
+        name: module name; nested levels are unnamed like in the sample file
+        vertex_count, face_count, uv_count: geometry sizes (uv_count defaults to vertex_count)
+        nesting: number of submodule levels wrapped around the geometry
+
+    Returns:
+        Module bytes
+    """
+    uv_count = vertex_count if uv_count is None else uv_count
+    parts = []
+    for level in range(nesting + 1):
+        parts.append(header if level == 0 else Model1SToOBJ.MODEL_HEADER)
+        parts.append(struct.pack('<H', module_id + level))
+        parts.append(_string(name if level == 0 else ""))
+        has_submodule = level < nesting
+        parts.append(struct.pack('<HH', int(has_submodule), 0))
+
+    # 最内层: 基础矩阵 + 50B未知数据 + 几何数据
+    parts.append(_matrix(rng))
+    parts.append(bytes(50))
+    parts.append(_geometry(rng, vertex_count, face_count, uv_count))
+
+    if nesting:
+        # 子模块在几何数据之后还有子矩阵 + 46B未知数据
+        translation = (rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))
+        parts.append(_matrix(rng, rng.uniform(-math.pi, math.pi), translation))
+        parts.append(bytes(46))
+    return b''.join(parts)
+
+def generate_model(module_count=8, vertex_count=1000, face_count=2000, uv_count=None, nesting=1, seed=0):
+    """
+    Generate a synthetic model.1s following the layout in model.markdown.
+
+    The first module is a plain "seat"; every other module is wrapped in
+    `nesting` submodule levels so that it carries a sub_matrix.
+
+    Returns:
+        File content as bytes
+    """
+    for label, count in (("vertex_count", vertex_count), ("face_count", face_count),
+                         ("uv_count", uv_count or 0)):
+        if not 0 <= count <= 0xFFFF:
+            raise ValueError(f"{label} 必须在 0-65535 之间: {count}")
+    if face_count and (vertex_count == 0 or uv_count == 0):
+        raise ValueError("没有顶点或UV时不能生成面片")
+
+    rng = random.Random(seed)
+    parts = [Model1SToOBJ.FILE_HEADER, bytes(6), struct.pack('<I', module_count)]
+    module_id = 1
+    for i in range(module_count):
+        header = Model1SToOBJ.MODEL_HEADER if i == 0 else Model1SToOBJ.BASE_MODEL_HEADER
+        name = "seat" if i == 0 else f"part{i}"
+        levels = 0 if i == 0 else nesting
+        parts.append(build_module(rng, header, module_id, name, vertex_count, face_count,
+                                  uv_count, levels))
+        module_id += levels + 1
+    return b''.join(parts)
+
+def write_model(path, **kwargs):
+    """Generate a synthetic model.1s and write it to path."""
+    data = generate_model(**kwargs)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic model.1s file.")
+    parser.add_argument("output", help="path of the model.1s to write")
+    parser.add_argument("--modules", type=int, default=8, help="number of top-level modules")
+    parser.add_argument("--vertices", type=int, default=1000, help="vertices per module")
+    parser.add_argument("--faces", type=int, default=2000, help="faces per module")
+    parser.add_argument("--uvs", type=int, default=None, help="UV records per module (default: vertices)")
+    parser.add_argument("--nesting", type=int, default=1, help="submodule levels per module")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    size = write_model(args.output, module_count=args.modules, vertex_count=args.vertices,
+                       face_count=args.faces, uv_count=args.uvs, nesting=args.nesting, seed=args.seed)
+    print(f"生成 {args.output}: {size} 字节")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+'''
+MIT License
+
+Copyright (c) 2025 VT-Tuzki
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import model_1s_to_obj as converter_module
+
+OUTPUT_FORMATS = ("obj", "merged", "glb")
+
+def convert_bundle(files, output_format="obj", weld=False):
+    """
+    Convert an uploaded bundle into a zip of output files, without touching disk.
+
+    Args:
+        files: dict mapping file names to bytes; must contain "model.1s",
+            textures (*.png) are copied or color-keyed like the CLI does
+        output_format: "obj", "merged" or "glb"
+        weld: merge duplicate vertices/UVs before writing (same as --weld)
+
+    Returns:
+        Zip archive bytes with the OBJ/MTL (or GLB) files and the textures
+    """
+    if "model.1s" not in files:
+        raise ValueError("上传内容中没有model.1s")
+    outputs = converter_module.convert_files(files, output_format, weld)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in outputs.items():
+            zip_file.writestr(name, data)
+    return archive.getvalue()
+
+def _warm_up():
+    """Import the heavy dependencies once in a fresh worker process."""
+    import PIL.Image  # noqa: F401
+    return os.getpid()
+
+def bundle_key(files, output_format, weld=False):
+    """Cache key: hash of the converter version, output options and every input file."""
+    options = f"{converter_module.CONVERTER_FORMAT_VERSION}:{output_format}:{int(weld)}"
+    digest = hashlib.sha256(options.encode('utf-8'))
+    for name in sorted(files):
+        digest.update(name.encode('utf-8') + b'\0')
+        digest.update(hashlib.sha256(files[name]).digest())
+    return digest.hexdigest()
+
+def read_upload(body, content_type):
+    """
+    Turn a request body into a {file name: bytes} dict.
+
+    A zip upload (application/zip) may contain model.1s and textures, folders
+    inside the archive are ignored; any other body is taken as a bare model.1s.
+    """
+    if content_type.split(';')[0].strip() not in ("application/zip", "application/x-zip-compressed"):
+        return {"model.1s": body}
+    try:
+        with zipfile.ZipFile(io.BytesIO(body)) as zip_file:
+            return {os.path.basename(info.filename): zip_file.read(info)
+                    for info in zip_file.infolist() if not info.is_dir()}
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"无效的zip文件: {e}")
+
+class ResultCache:
+    """
+    Thread-safe LRU of converted bundles, bounded by the total size in bytes.
+
+    Entries larger than max_bytes are not cached; inserting evicts the least
+    recently used entries until the total fits again.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server holding the warm worker pool and the result cache."""
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, cache_bytes=256 << 20, max_upload_bytes=64 << 20):
+        super().__init__(address, ConversionRequestHandler)
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = ResultCache(cache_bytes)
+        self.max_upload_bytes = max_upload_bytes
+        self._pool_lock = threading.Lock()
+        self.executor = self._start_pool()
+
+    def _start_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # 启动时让每个工作进程都完成导入, 第一个请求不用等进程启动
+        pids = [executor.submit(_warm_up) for _ in range(self.workers)]
+        logging.info(f"工作进程已就绪: {sorted({future.result() for future in pids})}")
+        return executor
+
+    def convert(self, files, output_format, weld=False):
+        """
+        Run convert_bundle on the pool.
+
+        A worker that dies (out of memory, a crash in PIL) breaks the whole
+        ProcessPoolExecutor; it is then replaced by a new warm pool and
+        BrokenProcessPool is raised for this request only.
+        """
+        executor = self.executor
+        try:
+            return executor.submit(convert_bundle, files, output_format, weld).result()
+        except BrokenProcessPool:
+            self._replace_pool(executor)
+            raise
+
+    def _replace_pool(self, broken):
+        with self._pool_lock:
+            # 多个请求同时发现进程池损坏时只重建一次
+            if self.executor is not broken:
+                return
+            logging.error("工作进程异常退出, 重新创建进程池")
+            broken.shutdown(wait=False)
+            self.executor = self._start_pool()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /convert[?format=obj|merged|glb][&weld=1]  body: zip bundle or bare model.1s
+        -> 200 application/zip with the converted files (X-Cache: hit/miss)
+    GET /health -> JSON with the cache statistics
+    """
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, json.dumps({"error": message}, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            self._send_error(404, "not found")
+            return
+        self._send(200, json.dumps({"status": "ok", "cache": self.server.cache.stats()}).encode('utf-8'))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self._send_error(404, "not found")
+            return
+        query = parse_qs(url.query)
+        output_format = query.get("format", ["obj"])[0]
+        weld = query.get("weld", ["0"])[0] not in ("0", "false", "")
+        if output_format not in OUTPUT_FORMATS:
+            self._send_error(400, f"未知的输出格式: {output_format}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send_error(400, "无效的Content-Length")
+            return
+        if length <= 0:
+            self._send_error(400, "请求体为空")
+            return
+        if length > self.server.max_upload_bytes:
+            self._send_error(413, f"上传内容超过 {self.server.max_upload_bytes} 字节")
+            return
+
+        try:
+            files = read_upload(self.rfile.read(length), self.headers.get("Content-Type", ""))
+            key = bundle_key(files, output_format, weld)
+            result = self.server.cache.get(key)
+            cache_state = "hit"
+            if result is None:
+                cache_state = "miss"
+                result = self.server.convert(files, output_format, weld)
+                self.server.cache.put(key, result)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+        except BrokenProcessPool:
+            self._send_error(503, "转换进程异常退出, 已重启工作进程, 请重试")
+            return
+        except Exception as e:
+            logging.error(f"转换失败: {type(e).__name__}: {e}")
+            self._send_error(500, f"{type(e).__name__}: {e}")
+            return
+        self._send(200, result, "application/zip",
+                   {"X-Cache": cache_state, "Content-Disposition": 'attachment; filename="model.zip"'})
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serve model.1s conversions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of conversion worker processes (default: CPU count)")
+    parser.add_argument("--cache-mb", type=int, default=256, help="result cache size in MB (default: 256)")
+    parser.add_argument("--max-upload-mb", type=int, default=64, help="largest accepted upload in MB (default: 64)")
+    parser.add_argument("--debug", action="store_true",
+                        help="write detailed parser tracing to log/debug_<timestamp>.log")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_arguments()
+    converter_module.setup_logging(args.debug)
+    server = ConversionServer((args.host, args.port), args.workers,
+                              args.cache_mb << 20, args.max_upload_mb << 20)
+    logging.info(f"转换服务监听 http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -22,16 +22,31 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
+import argparse
+import hashlib
+import io
+import json
+import math
 import struct
 import logging
+import mmap
 import os
+import posixpath
+import re
 import shutil
 import sys
-from tkinter import Tk,filedialog
+import tarfile
+import threading
+import time
+import zipfile
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from itertools import chain
 from datetime import datetime
 from pathlib import Path
+from array import array
 from dataclasses import dataclass, field
-from PIL import Image
 
 mtl_content = """
 # 定义材质
@@ -50,28 +65,305 @@ map_Kd 1.png
 map_Ks 0.png
 """
 
+# 纹理文件: 必需的贴图, 需要洋红色转透明的贴图, 以及一并处理的其他贴图格式
+REQUIRED_TEXTURES = ("0.png", "1.png")
+COLOR_KEY_TEXTURES = ("1.png",)
+TEXTURE_EXTENSIONS = (".png",)
+
+# 输出格式版本, 输出内容变化时递增以使增量转换的manifest失效
+CONVERTER_FORMAT_VERSION = 1
+
+IDENTITY_TRANSFORM = (
+    (1.0, 0.0, 0.0, 0.0),
+    (0.0, 1.0, 0.0, 0.0),
+    (0.0, 0.0, 1.0, 0.0),
+    (0.0, 0.0, 0.0, 1.0),
+)
+
+
+def _array_from_buffer(typecode, buffer):
+    """Copy a little-endian buffer into a typed array in one step."""
+    values = array(typecode)
+    values.frombytes(buffer)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+class _RecordView:
+    """
+    Read-only sequence of record tuples over a flat typed array.
+
+    Lets code written for the old list-of-tuples fields keep iterating,
+    indexing and comparing while the data stays in one contiguous buffer.
+    """
+    __slots__ = ("_data", "_width")
+
+    def __init__(self, data, width):
+        self._data = data
+        self._width = width
+
+    def _columns(self, start=0, stop=None):
+        """Per-field columns of records start..stop, sliced from the flat array."""
+        data = self._data
+        if start or stop is not None:
+            data = data[start * self._width:(len(self) if stop is None else stop) * self._width]
+        return [data[k::self._width] for k in range(self._width)]
+
+    def __len__(self):
+        return len(self._data) // self._width
+
+    def __iter__(self):
+        return zip(*self._columns())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            # 只切出需要的部分, 不必先把所有记录转成元组
+            return list(zip(*self._columns(start, max(start, stop))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("record index out of range")
+        return tuple(self._data[key * self._width:(key + 1) * self._width])
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+class _FaceView(_RecordView):
+    """Faces as (a, b, c, d, e, f, g, h, i, j, material_id) tuples."""
+    __slots__ = ()
+
+    def _columns(self, start=0, stop=None):
+        return super()._columns(start, stop) + [range(start, len(self) if stop is None else stop)]
+
+    def __getitem__(self, key):
+        face = super().__getitem__(key)
+        if isinstance(key, slice):
+            return face
+        return face + ((key + len(self)) % len(self),)
 
-@dataclass
 class module:
-    id: int = 0
-    name: str = ""
-    sub_id: int = 0
-    sub_name: str = ""
-    matrix: list = field(default_factory=list)
-    vertex_num: int = 0
-    vertex: list = field(default_factory=list)
-    uvs_num: int = 0
-    uvs: list = field(default_factory=list)
-    base_matrix: list = field(default_factory=list)
-    base_params_group1: list = field(default_factory=list)
-    base_params_group2: list = field(default_factory=list)
-    bone_id: int = 0
-    normals: list = field(default_factory=list)
-    faces_num: int = 0
-    sub_matrix: list = field(default_factory=list)
-    sub_params_group1: list = field(default_factory=list)
-    sub_params_group2: list = field(default_factory=list)
-    faces: list = field(default_factory = list)
+    """
+    Decoded module with geometry kept in contiguous typed arrays.
+
+    vertex_data/normal_data hold float32 xyz triples, uv_data holds (u, v)
+    pairs with V already flipped, and face_data holds the 10 uint16 indices
+    of each face. vertex, normals, uvs and faces expose them as the tuple
+    sequences the writers use; material_id is the face index and is not
+    stored.
+    """
+    __slots__ = ("id", "name", "sub_id", "sub_name", "matrix", "vertex_num", "uvs_num",
+                 "base_matrix", "base_params_group1", "base_params_group2", "bone_id",
+                 "faces_num", "sub_matrix", "sub_params_group1", "sub_params_group2",
+                 "transform", "vertex_data", "normal_data", "uv_data", "face_data")
+
+    def __init__(self, id=0, name="", sub_id=0, sub_name="", matrix=(), vertex_num=0,
+                 vertex=(), uvs_num=0, uvs=(), base_matrix=(), base_params_group1=(),
+                 base_params_group2=(), bone_id=0, normals=(), faces_num=0, sub_matrix=(),
+                 sub_params_group1=(), sub_params_group2=(), faces=(), transform=()):
+        self.id = id
+        self.name = name
+        self.sub_id = sub_id
+        self.sub_name = sub_name
+        self.matrix = matrix
+        self.vertex_num = vertex_num
+        self.uvs_num = uvs_num
+        self.base_matrix = base_matrix
+        self.base_params_group1 = base_params_group1
+        self.base_params_group2 = base_params_group2
+        self.bone_id = bone_id
+        self.faces_num = faces_num
+        self.sub_matrix = sub_matrix
+        self.sub_params_group1 = sub_params_group1
+        self.sub_params_group2 = sub_params_group2
+        # base_matrix与sub_matrix合成后的4x4仿射变换(行主序), 供各导出器复用
+        self.transform = transform
+        self.vertex = vertex
+        self.normals = normals
+        self.uvs = uvs
+        self.faces = faces
+
+    @property
+    def vertex(self):
+        return _RecordView(self.vertex_data, 3)
+
+    @vertex.setter
+    def vertex(self, records):
+        self.vertex_data = array('f', chain.from_iterable(records))
+
+    @property
+    def normals(self):
+        return _RecordView(self.normal_data, 3)
+
+    @normals.setter
+    def normals(self, records):
+        self.normal_data = array('f', chain.from_iterable(records))
+
+    @property
+    def uvs(self):
+        return _RecordView(self.uv_data, 2)
+
+    @uvs.setter
+    def uvs(self, records):
+        self.uv_data = array('d', chain.from_iterable(records))
+
+    @property
+    def faces(self):
+        return _FaceView(self.face_data, 10)
+
+    @faces.setter
+    def faces(self, records):
+        self.face_data = array('H', chain.from_iterable(face[:10] for face in records))
+
+    def __repr__(self):
+        return (f"module(id={self.id}, name={self.name!r}, sub_id={self.sub_id}, "
+                f"sub_name={self.sub_name!r}, vertex_num={self.vertex_num}, "
+                f"uvs_num={self.uvs_num}, faces_num={self.faces_num}, bone_id={self.bone_id})")
+
+class ConversionProfile:
+    """
+    Stage timings and counters collected in --profile mode.
+
+    Each stage accumulates its call count, seconds and any counters given to
+    stage()/add(). Stages can nest: obj_write includes the vertex_transform
+    time of the same module.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, **counters):
+        """Time a block; the yielded dict can be updated with more counters."""
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.add(name, time.perf_counter() - start, **counters)
+
+    def add(self, name, seconds, calls=1, **counters):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            for key, value in counters.items():
+                entry[key] = entry.get(key, 0) + value
+
+    def merge(self, profile_dict):
+        """Add the stages of another profile (e.g. from a batch worker)."""
+        for name, entry in profile_dict.get("stages", {}).items():
+            counters = {key: value for key, value in entry.items() if key not in ("calls", "seconds")}
+            self.add(name, entry["seconds"], entry["calls"], **counters)
+
+    def to_dict(self):
+        with self._lock:
+            return {"total_seconds": time.perf_counter() - self._start,
+                    "stages": {name: dict(entry) for name, entry in self.stages.items()}}
+
+class _NullProfile:
+    """Profile stand-in used when --profile is off; records nothing."""
+    enabled = False
+
+    def stage(self, name, **counters):
+        return nullcontext(counters)
+
+    def add(self, name, seconds, calls=1, **counters):
+        pass
+
+NULL_PROFILE = _NullProfile()
+
+class FormatSchema:
+    """
+    Declarative layout of the fixed-size regions of a model.1s file.
+
+    Each region is a list of (field, struct code) pairs read with a single
+    unpack_from; a None field marks skipped bytes ("50x"). A code with a
+    repeat count other than "s" ("21f", "10H") yields one tuple. Every region
+    is compiled into a struct.Struct once, when the schema is created, so
+    supporting another format version means adding a schema, not offsets.
+    """
+
+    def __init__(self, version, regions):
+        self.version = version
+        self.regions = regions
+        self._compiled = {name: self._compile(fields) for name, fields in regions.items()}
+
+    @staticmethod
+    def _compile(fields):
+        groups = []
+        position = 0
+        for name, code in fields:
+            if name is None:
+                if code[-1] != 'x':
+                    raise ValueError(f"未命名字段只能是填充字节: {code}")
+                continue
+            count = 1 if code[-1] == 's' else int(code[:-1] or 1)
+            groups.append((position, position + count))
+            position += count
+        unpacker = struct.Struct('<' + ''.join(code for _, code in fields))
+        # 全是单值字段时unpack_from的结果即为各字段的值, 不需要再分组
+        if all(end - start == 1 for start, end in groups):
+            groups = None
+        return unpacker, groups
+
+    def struct(self, name):
+        """Compiled struct.Struct of a region."""
+        return self._compiled[name][0]
+
+    def size(self, name):
+        """Size of a region in bytes."""
+        return self._compiled[name][0].size
+
+    def fields(self, name):
+        """Names of the values read() returns for a region, in order."""
+        return [field for field, _ in self.regions[name] if field is not None]
+
+    def read(self, name, data, index):
+        """
+        Unpack region `name` at index.
+
+        Returns:
+            (tuple with one value per named field, index after the region)
+        """
+        unpacker, groups = self._compiled[name]
+        values = unpacker.unpack_from(data, index)
+        if groups is not None:
+            values = tuple(values[start] if end - start == 1 else values[start:end] for start, end in groups)
+        return values, index + unpacker.size
+
+# model.1s布局(见model.markdown); 名称(UTF-16LE)和几何数组是变长的, 不在固定区域内
+MODEL_1S_SCHEMA = FormatSchema(1, {
+    # 文件头标识 + 6B零填充 + 模块个数, 第一个模块紧随其后
+    "file_header": [("marker", "6s"), (None, "6x"), ("module_count", "I")],
+    # 模块头标识 + 模块ID + 名称长度(字符数), 之后是(名称长度+1)*2B的名称
+    "module_header": [("marker", "6s"), ("id", "H"), ("name_length", "H")],
+    # 是否有子模块 + 2B未知; 有子模块时下一个模块头紧随其后
+    "module_flags": [("has_submodule", "H"), (None, "2x")],
+    # 21个float的矩阵(旋转0-8, 平移9-11, 之后为参数组) + 50B未知
+    "base_matrix": [("matrix", "21f"), (None, "50x")],
+    # 0xAA27 + 骨骼ID + 顶点数 + 2B未知, 之后是顶点数组
+    "geometry_header": [("marker", "2s"), ("bone_id", "H"), ("vertex_count", "H"), (None, "2x")],
+    "normal_header": [("normal_count", "I")],
+    "uv_header": [("uv_count", "H"), (None, "2x")],
+    "face_header": [("face_count", "H"), (None, "2x")],
+    # 子模块几何数据之后的子矩阵 + 46B未知
+    "sub_matrix": [("matrix", "21f"), (None, "46x")],
+    # 变长数组中的单条记录
+    "vertex": [("xyz", "3f")],
+    "uv": [("vertex_id", "H"), ("tex_block", "H"), ("uv", "2f")],
+    "face": [("indices", "10H")],
+})
 
 class Model1SToOBJ:
     # 文件头标识
@@ -79,10 +371,56 @@ class Model1SToOBJ:
     FILE_HEADER =           b'\xaa\x47\x49\x02\x8c\x07'
     BASE_MODEL_HEADER =     b'\xaa\x47\x3c\x03\x07\x0e'
     VERTEX_COORDINATES_HEADER = b'\xaa\x27'
+    HEADER_NAMES = {
+        FILE_HEADER: "file",
+        BASE_MODEL_HEADER: "base_model",
+        MODEL_HEADER: "model",
+    }
+    # 一次扫描即可找出所有文件头/模块头的位置
+    HEADER_PATTERN = re.compile(b'|'.join(map(re.escape, HEADER_NAMES)))
+    # 文件布局, 各固定区域已编译为struct.Struct
+    SCHEMA = MODEL_1S_SCHEMA
+    # 几何数据记录格式 (整块一次性解码)
+    VERTEX_RECORD = SCHEMA.struct("vertex")     # x, y, z / nx, ny, nz
+    UV_RECORD = SCHEMA.struct("uv")             # vertex_id, tex_block, u, v
+    FACE_RECORD = SCHEMA.struct("face")         # a, b, c, d, e, f, g, h, i, j
+    WRITE_CHUNK = 4096                          # OBJ文本每次批量写入的记录数
+    MERGED_WRITE_BUFFER = 1 << 20               # 合并OBJ文件的写缓冲大小
+    STREAM_QUEUE_SIZE = 8                       # 流式模式下已解码、等待写出的模块上限
+    LOD_MAX_RESOLUTION = 256                    # LOD顶点聚类网格每个轴的最大格数
+    BOUNDS_STEP = 1e-6                          # bounds.json中坐标的精度
     module_list = field(default_factory=module)
 
-    def __init__(self):
+    def __init__(self, bulk_decode=True, decode_geometry=True, output_format="obj", profile=None,
+                 streaming=False, writer_threads=2, weld=False, lod_ratios=(), bounds=False,
+                 decode_workers=1, map_geometry=False):
         self.output_dir = ""
+        # --profile模式下记录各阶段耗时和计数
+        self.profile = profile or NULL_PROFILE
+        # 输出格式: "obj" 每个模块一个OBJ文件加test.mtl; "merged" 所有模块分组写入一个model.obj;
+        # "glb" 整个模型一个model.glb
+        self.output_format = output_format
+        # 本次转换写出的文件名(相对output_dir)
+        self.output_files = []
+        # True: 顶点/法线/UV/面片整块解码; False: 逐值解码(用于对照验证)
+        self.bulk_decode = bulk_decode
+        # False: 只读取几何数据的数量并跳过数据本身(用于建立模块索引)
+        self.decode_geometry = decode_geometry
+        # True: 输入文件用mmap映射, 解码出的模块交给写线程输出后即释放, 解析与写盘并行
+        self.streaming = streaming
+        # 流式模式下写OBJ的线程数(merged格式固定为1个以保持分组顺序)
+        self.writer_threads = writer_threads
+        # True: 输出前合并重复的顶点/UV, 并去掉退化面片和未使用的顶点(见weld_module)
+        self.weld = weld
+        # 每个比例生成一级简化模型: obj/merged写为<name>_<id>_lod{n}.obj, glb写为MSFT_lod节点
+        self.lod_ratios = tuple(lod_ratios)
+        # True: 计算每个模块变换前后的包围盒/包围球/质心及模块BVH, 写入bounds.json
+        self.bounds = bounds
+        # 大于1时先定位各模块入口, 再由多个进程通过共享mmap并行解码
+        self.decode_workers = decode_workers
+        # True: 顶点/法线/面片数组直接是输入数据上的memoryview, 不复制(Model1SReader使用);
+        # 这样的模块会一直引用输入数据, 也不能pickle
+        self.map_geometry = map_geometry
 
     def _write_obj_header(self, obj_file, module_info):
         """写入OBJ文件头信息"""
@@ -92,126 +430,753 @@ class Model1SToOBJ:
         obj_file.write(f"# Module Name: {module_info.name}\n")
         obj_file.write("# Transformation Matrix:\n")
 
+    def _write_records(self, obj_file, line_format, records):
+        """按块批量格式化记录, 每块只做一次%格式化和一次write"""
+        for start in range(0, len(records), self.WRITE_CHUNK):
+            chunk = records[start:start + self.WRITE_CHUNK]
+            obj_file.write((line_format * len(chunk)) % tuple(chain.from_iterable(chunk)))
+
     def _write_vertex(self, obj_file, module_info: module):
-        matrix1 = module_info.base_matrix
-        matrix2 = module_info.sub_matrix
-        for i in range(module_info.vertex_num):
-            x, y, z = module_info.vertex[i]
-            if((module_info.name == 'seat') | (matrix2 == None)):
-                obj_file.write(f"v {x:.6f} {y:.6f} {z:.6f}\n")
-            else:
-                rotation_matrix1 = [
-                    [matrix1[0], matrix1[1], matrix1[2]],   # 第一行
-                    [matrix1[3], matrix1[4], matrix1[5]],   # 第二行
-                    [matrix1[6], matrix1[7], matrix1[8]]    # 第三行
-                ]
-                rotation_matrix2 = [
-                    [matrix2[0], matrix2[1], matrix2[2]],   # 第一行
-                    [matrix2[3], matrix2[4], matrix2[5]],   # 第二行
-                    [matrix2[6], matrix2[7], matrix2[8]]    # 第三行
-                ]
-                x_rot1 = x * rotation_matrix1[0][0] + y * rotation_matrix1[0][1] + z * rotation_matrix1[0][2]
-                y_rot1 = x * rotation_matrix1[1][0] + y * rotation_matrix1[1][1] + z * rotation_matrix1[1][2]
-                z_rot1 = x * rotation_matrix1[2][0] + y * rotation_matrix1[2][1] + z * rotation_matrix1[2][2]
-
-                new_x1 = x_rot1 + matrix1[9]
-                new_y1 = y_rot1 + matrix1[10]
-                new_z1 = z_rot1 + matrix1[11]
-
-
-                x_rot2 = new_x1 * rotation_matrix2[0][0] + new_y1 * rotation_matrix2[0][1] + new_z1 * rotation_matrix2[0][2]
-                y_rot2 = new_x1 * rotation_matrix2[1][0] + new_y1 * rotation_matrix2[1][1] + new_z1 * rotation_matrix2[1][2]
-                z_rot2 = new_x1 * rotation_matrix2[2][0] + new_y1 * rotation_matrix2[2][1] + new_z1 * rotation_matrix2[2][2]
-
-                new_x = x_rot2 + matrix2[9]
-                new_y = y_rot2 + matrix2[10]
-                new_z = z_rot2 + matrix2[11]
-                # obj_file.write(f"v {new_x:.6f} {new_y:.6f} {new_z:.6f}\n")
-                obj_file.write(f"v {new_x:.6f} {new_y:.6f} {new_z:.6f}\n")
+        """写入顶点"""
+        with self.profile.stage("vertex_transform", vertices=module_info.vertex_num):
+            vertices = self.transform_points(module_info.transform, module_info.vertex[:module_info.vertex_num])
+        self._write_records(obj_file, "v %.6f %.6f %.6f\n", vertices)
 
     def _write_uv(self, obj_file, module_info: module):
         """写入UV坐标"""
         if(module_info.uvs == None) :
             obj_file.write("# this module not have uvs\n")
             return
-        for uv in module_info.uvs:
-            obj_file.write(f"vt {uv[0]:.6f} {uv[1]:.6f}\n")
+        self._write_records(obj_file, "vt %.6f %.6f\n", module_info.uvs)
 
     def _write_normal(self, obj_file, module_info: module):
         """写入法线"""
         if(module_info.normals == None) :
             obj_file.write("# this module not have normals\n")
             return
-        for nx, ny, nz in module_info.normals:
-            obj_file.write(f"vn {nx:.6f} {ny:.6f} {nz:.6f}\n")
+        with self.profile.stage("vertex_transform", normals=len(module_info.normal_data) // 3):
+            normals = self.transform_normals(module_info.transform, module_info.normals)
+        self._write_records(obj_file, "vn %.6f %.6f %.6f\n", normals)
 
-    def _write_faces(self, obj_file, module_info: module):
+    def _write_faces(self, obj_file, module_info: module, vertex_offset=0, uv_offset=0, merged=False):
         """写入面片"""
         if(module_info.faces == None) :
             obj_file.write("# this module not have faces\n")
             return
-        for a, b, c, d, e, f, g, h, i, j, material_id in module_info.faces:
-                obj_file.write(f"f {g+1}/{a+1}/ {h+1}/{b+1}/ {i+1}/{c+1}/\n")
-
-    def _create_obj_file(self, module_info: module):
+        # 顶点索引取g,h,i, UV索引取a,b,c (OBJ索引从1开始, 合并文件中再加上之前模块的数量)
+        v = vertex_offset + 1
+        t = uv_offset + 1
+        face_indices = [(g+v, a+t, h+v, b+t, i+v, c+t)
+                        for a, b, c, d, e, f, g, h, i, j, material_id in module_info.faces]
+        if merged:
+            # 合并文件中越界的索引会指向后面模块的顶点, 与weld_module/_glb_vertex_arrays一样跳过这些面片
+            vertex_end = v + min(module_info.vertex_num, len(module_info.vertex_data) // 3)
+            uv_end = t + len(module_info.uv_data) // 2
+            count = len(face_indices)
+            face_indices = [face for face in face_indices
+                            if max(face[0], face[2], face[4]) < vertex_end and max(face[1], face[3], face[5]) < uv_end]
+            if len(face_indices) != count:
+                logging.debug(f"模块 {module_info.name}: 跳过 {count - len(face_indices)} 个索引越界的面片")
+        self._write_records(obj_file, "f %d/%d/ %d/%d/ %d/%d/\n", face_indices)
+
+    def _write_obj_module(self, obj_file, module_info: module):
+        """写入单个模块的完整OBJ内容"""
+        self._write_obj_header(obj_file, module_info)
+        obj_file.write("\n# Vertex data will be added here\n")
+        obj_file.write("\nmtllib test.mtl\n")
+        self._write_vertex(obj_file, module_info)
+        self._write_uv(obj_file, module_info)
+        self._write_normal(obj_file, module_info)
+        obj_file.write("\nusemtl my_textured_material\n")
+        self._write_faces(obj_file, module_info)
+
+    def _create_obj_file(self, module_info: module, filename=None):
         """创建OBJ文件并写入基本信息"""
-        filename = f"{module_info.name}_{module_info.id}.obj"
+        filename = filename or f"{module_info.name}_{module_info.id}.obj"
         filepath = os.path.join(self.output_dir, filename)
-        with open(filepath, 'w', encoding='utf-8') as obj_file:
-            self._write_obj_header(obj_file, module_info)
-            obj_file.write("\n# Vertex data will be added here\n")
-            obj_file.write("\nmtllib test.mtl\n")
-            self._write_vertex(obj_file, module_info)
-            self._write_uv(obj_file, module_info)
-            self._write_normal(obj_file, module_info)
-            obj_file.write("\nusemtl my_textured_material\n")
-            self._write_faces(obj_file, module_info)
+        with self.profile.stage("obj_write", files=1) as counters:
+            with open(filepath, 'w', encoding='utf-8') as obj_file:
+                self._write_obj_module(obj_file, module_info)
+                counters["bytes"] = obj_file.tell()
 
         logging.debug(f"Created OBJ file: {filepath}")
+        self.output_files.append(filename)
         return filepath
 
+    def _open_merged_obj_file(self):
+        """创建合并的OBJ文件, 所有模块作为分组写入同一个文件"""
+        filename = "model.obj"
+        filepath = os.path.join(self.output_dir, filename)
+        obj_file = open(filepath, 'w', encoding='utf-8', buffering=self.MERGED_WRITE_BUFFER)
+        self._write_merged_header(obj_file)
+        self.output_files.append(filename)
+        return obj_file
+
+    def _write_merged_header(self, obj_file):
+        """写入合并OBJ文件的文件头, 并重置索引偏移"""
+        obj_file.write(f"# Model 1S Conversion Tool\n")
+        obj_file.write(f"# Generated at {datetime.now().isoformat()}\n")
+        obj_file.write("\nmtllib test.mtl\n")
+        # 已写入的顶点/UV数量, 后续模块的面片索引需要加上这些偏移
+        self._merged_vertex_offset = 0
+        self._merged_uv_offset = 0
+
+    def _write_merged_module(self, obj_file, module_info: module):
+        """将一个模块作为o/g分组追加到合并的OBJ文件"""
+        group_name = f"{module_info.name}_{module_info.id}"
+        obj_file.write(f"\n# Module ID: {module_info.id}\n")
+        obj_file.write(f"# Module Name: {module_info.name}\n")
+        obj_file.write(f"o {group_name}\ng {group_name}\n")
+        with self.profile.stage("obj_write", modules=1):
+            self._write_vertex(obj_file, module_info)
+            self._write_uv(obj_file, module_info)
+            self._write_normal(obj_file, module_info)
+            obj_file.write("usemtl my_textured_material\n")
+            self._write_faces(obj_file, module_info, self._merged_vertex_offset, self._merged_uv_offset,
+                              merged=True)
+        self._merged_vertex_offset += min(module_info.vertex_num, len(module_info.vertex_data) // 3)
+        self._merged_uv_offset += len(module_info.uvs)
+
     def _create_mtl_file(self, file_name):
         """创建OBJ文件并写入基本信息"""
         filename = f"test.mtl"
         filepath = os.path.join(self.output_dir, filename)
         try:
-            with open(filepath, 'w', encoding='utf-8') as obj_file:
-                obj_file.write(mtl_content)
+            with self.profile.stage("mtl_write", files=1, bytes=len(mtl_content.encode('utf-8'))):
+                with open(filepath, 'w', encoding='utf-8') as obj_file:
+                    obj_file.write(mtl_content)
             logging.info(f"生成mtl_file ok")
+            self.output_files.append(filename)
         except Exception as e:
             logging.error(f"生成mtl_file 出错error:{e}")
         return filepath
 
-    def parse_transform_matrix(self, matrix_data):
-        """解析15+6的镜像对称参数结构"""
-        floats = struct.unpack('<21f', matrix_data)
+    def _glb_vertex_arrays(self, module_info: module):
+        """
+        Build glTF vertex attributes and triangle indices for one module.
+
+        glTF needs a single index per vertex, so every distinct
+        (position index g/h/i, UV index a/b/c) corner becomes one vertex.
+        Normals are only attached when there is one per position; UVs are
+        flipped back to glTF's top-left origin.
 
+        Returns:
+            (positions, normals or None, texcoords, indices) typed arrays
+        """
+        vertex_data = module_info.vertex_data
+        uv_data = module_info.uv_data
+        face_data = module_info.face_data
+        vertex_count = len(vertex_data) // 3
+        uv_count = len(uv_data) // 2
+
+        corners = {}  # (position index, uv index) -> glTF vertex index
+        indices = []
+        skipped = 0
+        for g, h, i, a, b, c in zip(face_data[6::10], face_data[7::10], face_data[8::10],
+                                    face_data[0::10], face_data[1::10], face_data[2::10]):
+            if max(g, h, i) >= vertex_count or max(a, b, c) >= uv_count:
+                skipped += 1
+                continue
+            for corner in ((g, a), (h, b), (i, c)):
+                indices.append(corners.setdefault(corner, len(corners)))
+        if skipped:
+            logging.debug(f"模块 {module_info.name}: 跳过 {skipped} 个索引越界的面片")
+
+        positions = array('f')
+        texcoords = array('f')
+        for position, uv in corners:
+            positions.extend(vertex_data[position * 3:position * 3 + 3])
+            texcoords.append(uv_data[uv * 2])
+            texcoords.append(1.0 - uv_data[uv * 2 + 1])
+
+        normals = None
+        if len(module_info.normal_data) == len(vertex_data):
+            normal_data = module_info.normal_data
+            normals = array('f')
+            for position, _ in corners:
+                normals.extend(normal_data[position * 3:position * 3 + 3])
+
+        index_type = 'H' if len(corners) <= 0xFFFF else 'I'
+        return positions, normals, texcoords, array(index_type, indices)
+
+    def _glb_matrix(self, matrix):
+        """Convert a 3x3 rotation + translation(9-11) matrix to glTF column-major order."""
+        return [matrix[0], matrix[3], matrix[6], 0.0,
+                matrix[1], matrix[4], matrix[7], 0.0,
+                matrix[2], matrix[5], matrix[8], 0.0,
+                matrix[9], matrix[10], matrix[11], 1.0]
+
+    def build_glb(self, module_list, lod_list=None):
+        """
+        Pack decoded modules into a binary glTF 2.0 (.glb) document.
+
+        Each module gets a node named <name>_<id>. Modules that are moved by
+        base_matrix and sub_matrix in the OBJ export get a sub_matrix node
+        with a base_matrix child holding the mesh, so vertices stay in module
+        space. The material uses 1.png as base color and 0.png as specular
+        texture, like test.mtl.
+
+        lod_list, if given, holds the simplified modules of every module (see
+        lod_modules); they become MSFT_lod alternatives of the mesh node.
+
+        Returns:
+            The .glb file content as bytes
+        """
+        binary = bytearray()
+        gltf = {
+            "asset": {"version": "2.0", "generator": "Model 1S Conversion Tool"},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "accessors": [],
+            "bufferViews": [],
+            "materials": [{
+                "name": "my_textured_material",
+                "pbrMetallicRoughness": {"baseColorTexture": {"index": 0}, "metallicFactor": 0.0},
+                "alphaMode": "MASK",
+                "extensions": {"KHR_materials_specular": {"specularColorTexture": {"index": 1}}},
+            }],
+            "extensionsUsed": ["KHR_materials_specular"],
+            "textures": [{"source": 0, "sampler": 0}, {"source": 1, "sampler": 0}],
+            "images": [{"uri": "1.png"}, {"uri": "0.png"}],
+            "samplers": [{}],
+        }
+
+        def add_accessor(values, component_type, accessor_type, width, target):
+            # bufferView按4字节对齐
+            binary.extend(b'\x00' * (-len(binary) % 4))
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            gltf["bufferViews"].append({"buffer": 0, "byteOffset": len(binary),
+                                        "byteLength": len(values) * values.itemsize, "target": target})
+            binary.extend(values.tobytes())
+            accessor = {"bufferView": len(gltf["bufferViews"]) - 1, "componentType": component_type,
+                        "count": len(values) // width, "type": accessor_type}
+            if accessor_type == "VEC3" and target == 34962:
+                accessor["min"] = [min(values[k::3]) for k in range(3)]
+                accessor["max"] = [max(values[k::3]) for k in range(3)]
+            gltf["accessors"].append(accessor)
+            return len(gltf["accessors"]) - 1
+
+        def add_mesh(module_info, name):
+            positions, normals, texcoords, indices = self._glb_vertex_arrays(module_info)
+            if not indices:
+                return None
+            attributes = {"POSITION": add_accessor(positions, 5126, "VEC3", 3, 34962),
+                          "TEXCOORD_0": add_accessor(texcoords, 5126, "VEC2", 2, 34962)}
+            if normals is not None:
+                attributes["NORMAL"] = add_accessor(normals, 5126, "VEC3", 3, 34962)
+            index_component = 5123 if indices.typecode == 'H' else 5125
+            primitive = {"attributes": attributes, "material": 0,
+                         "indices": add_accessor(indices, index_component, "SCALAR", 1, 34963)}
+            gltf["meshes"].append({"name": name, "primitives": [primitive]})
+            return len(gltf["meshes"]) - 1
+
+        def add_lods(mesh_node, name, levels):
+            # MSFT_lod: LOD节点不放入场景, 由网格节点的扩展引用, 并使用同样的局部矩阵
+            lod_ids = []
+            for level, lod_module in enumerate(levels, 1):
+                lod_mesh = add_mesh(lod_module, f"{name}_lod{level}")
+                if lod_mesh is None:
+                    continue
+                lod_node = {"name": f"{name}_lod{level}", "mesh": lod_mesh}
+                if "matrix" in mesh_node:
+                    lod_node["matrix"] = mesh_node["matrix"]
+                gltf["nodes"].append(lod_node)
+                lod_ids.append(len(gltf["nodes"]) - 1)
+            if lod_ids:
+                mesh_node["extensions"] = {"MSFT_lod": {"ids": lod_ids}}
+                if "MSFT_lod" not in gltf["extensionsUsed"]:
+                    gltf["extensionsUsed"].append("MSFT_lod")
+
+        for position, module_info in enumerate(module_list):
+            node = {"name": f"{module_info.name}_{module_info.id}"}
+            mesh_index = add_mesh(module_info, node["name"])
+            levels = lod_list[position] if lod_list else ()
+
+            if module_info.transform and module_info.transform != IDENTITY_TRANSFORM:
+                # 先base_matrix后sub_matrix: sub_matrix为外层节点
+                child = {"name": f"{module_info.sub_name or module_info.name}_{module_info.sub_id}",
+                         "matrix": self._glb_matrix(module_info.base_matrix)}
+                if mesh_index is not None:
+                    child["mesh"] = mesh_index
+                    add_lods(child, node["name"], levels)
+                gltf["nodes"].append(child)
+                node["matrix"] = self._glb_matrix(module_info.sub_matrix)
+                node["children"] = [len(gltf["nodes"]) - 1]
+            elif mesh_index is not None:
+                node["mesh"] = mesh_index
+                add_lods(node, node["name"], levels)
+            gltf["nodes"].append(node)
+            gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]) - 1)
+
+        for key in ("meshes", "accessors", "bufferViews"):
+            if not gltf[key]:
+                del gltf[key]
+        if binary:
+            binary.extend(b'\x00' * (-len(binary) % 4))
+            gltf["buffers"] = [{"byteLength": len(binary)}]
+
+        json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+        json_chunk += b' ' * (-len(json_chunk) % 4)
+        chunks = [struct.pack('<II', len(json_chunk), 0x4E4F534A), json_chunk]  # JSON
+        if binary:
+            chunks += [struct.pack('<II', len(binary), 0x004E4942), bytes(binary)]  # BIN
+        body = b''.join(chunks)
+        return struct.pack('<III', 0x46546C67, 2, 12 + len(body)) + body  # glTF, version 2
+
+    def _create_glb_file(self, module_list, lod_list=None):
+        """创建包含全部模块的GLB文件"""
+        filename = "model.glb"
+        filepath = os.path.join(self.output_dir, filename)
+        with self.profile.stage("glb_write", files=1) as counters:
+            content = self.build_glb(module_list, lod_list)
+            counters["bytes"] = len(content)
+            with open(filepath, 'wb') as glb_file:
+                glb_file.write(content)
+        logging.info(f"生成glb_file ok: {filepath}")
+        self.output_files.append(filename)
+        return filepath
+
+    def _split_transform_matrix(self, floats):
+        """把base_matrix/sub_matrix区域的21个float分为矩阵和两个参数组(15+6的镜像对称参数结构)"""
         base_matrix = floats[:16]  # 4x4矩阵（通常为单位矩阵）
         base_params_group1 = floats[16:19]  # 参数组1
         base_params_group2 = floats[19:22]  # 参数组2
 
         return (base_matrix, base_params_group1, base_params_group2)
 
+    def compose_transform(self, module_info: module):
+        """
+        Compose base_matrix and sub_matrix into one 4x4 affine transform.
+
+        Each matrix holds a row-major 3x3 rotation in floats 0-8 and the
+        translation in floats 9-11; the vertex is rotated and translated by
+        base_matrix first, then by sub_matrix. seat and modules without a
+        sub_matrix are left in place (identity).
+        """
+        matrix1 = module_info.base_matrix
+        matrix2 = module_info.sub_matrix
+        if module_info.name == 'seat' or not matrix1 or not matrix2:
+            return IDENTITY_TRANSFORM
+
+        rows = []
+        for r in range(3):
+            a, b, c = matrix2[r*3:r*3+3]
+            rows.append((
+                a * matrix1[0] + b * matrix1[3] + c * matrix1[6],
+                a * matrix1[1] + b * matrix1[4] + c * matrix1[7],
+                a * matrix1[2] + b * matrix1[5] + c * matrix1[8],
+                a * matrix1[9] + b * matrix1[10] + c * matrix1[11] + matrix2[9 + r],
+            ))
+        rows.append((0.0, 0.0, 0.0, 1.0))
+        return tuple(rows)
+
+    def transform_points(self, transform, points):
+        """Apply a 4x4 affine transform to a whole list of (x, y, z) points."""
+        if not transform or transform == IDENTITY_TRANSFORM:
+            return points
+        (m00, m01, m02, tx), (m10, m11, m12, ty), (m20, m21, m22, tz), _ = transform
+        return [(x * m00 + y * m01 + z * m02 + tx,
+                 x * m10 + y * m11 + z * m12 + ty,
+                 x * m20 + y * m21 + z * m22 + tz) for x, y, z in points]
+
+    def transform_normals(self, transform, normals):
+        """Apply the inverse-transpose of the transform's 3x3 part to normals."""
+        if not transform:
+            return normals
+        (a, b, c, _), (d, e, f, _), (g, h, i, _), _ = transform
+        if (a, b, c, d, e, f, g, h, i) == (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0):
+            return normals  # 纯平移不影响法线
+        # 余子式矩阵除以行列式即为逆转置矩阵
+        det = a * (e * i - f * h) + b * (f * g - d * i) + c * (d * h - e * g)
+        if det == 0.0:
+            return normals
+        inv_det = 1.0 / det
+        c00, c01, c02 = (e * i - f * h) * inv_det, (f * g - d * i) * inv_det, (d * h - e * g) * inv_det
+        c10, c11, c12 = (c * h - b * i) * inv_det, (a * i - c * g) * inv_det, (b * g - a * h) * inv_det
+        c20, c21, c22 = (b * f - c * e) * inv_det, (c * d - a * f) * inv_det, (a * e - b * d) * inv_det
+        return [(x * c00 + y * c01 + z * c02,
+                 x * c10 + y * c11 + z * c12,
+                 x * c20 + y * c21 + z * c22) for x, y, z in normals]
+
+    @staticmethod
+    def _unique_rows(values, width, count):
+        """
+        Deduplicate the first `count` rows of a flat typed array by their raw bytes.
+
+        Returns:
+            (remap, source): remap[old] is the new row of every old row, and
+            source[new] is the first old row holding that value
+        """
+        raw = values.tobytes()
+        size = values.itemsize * width
+        slots = {}
+        remap = [slots.setdefault(raw[row * size:(row + 1) * size], len(slots)) for row in range(count)]
+        source = [None] * len(slots)
+        for old, new in enumerate(remap):
+            if source[new] is None:
+                source[new] = old
+        return remap, source
+
+    @staticmethod
+    def _gather_rows(values, width, rows):
+        """Copy the given rows of a flat typed array into a new array."""
+        raw = values.tobytes()
+        size = values.itemsize * width
+        # 缓存文件映射出的memoryview用format表示类型
+        gathered = array(getattr(values, "typecode", None) or values.format)
+        gathered.frombytes(b''.join(raw[row * size:(row + 1) * size] for row in rows))
+        return gathered
+
+    def weld_module(self, module_info: module, drop_degenerate=True, drop_unused=True):
+        """
+        Return a compact copy of a module with duplicate vertices and UVs merged.
+
+        Positions are merged when their bits are equal, together with their
+        normals when there is one normal per vertex; UVs are merged the same
+        way. Face indices g,h,i and a,b,c are remapped; faces pointing outside
+        the vertex or UV list are dropped. d,e,f are kept as read.
+
+        Args:
+            module_info: decoded module, left unchanged
+            drop_degenerate: drop faces whose three corners weld to fewer than three vertices
+            drop_unused: drop vertices and UVs no remaining face references
+
+        Returns:
+            New module sharing the metadata of module_info
+        """
+        vertex_count = min(module_info.vertex_num, len(module_info.vertex_data) // 3)
+        uv_count = len(module_info.uv_data) // 2
+        # 法线与顶点一一对应时, 顶点和法线一起作为去重的键
+        per_vertex_normals = len(module_info.normal_data) == vertex_count * 3
+        if per_vertex_normals:
+            keys = array('f', chain.from_iterable(chain.from_iterable(zip(module_info.vertex,
+                                                                          module_info.normals))))
+            vertex_remap, vertex_source = self._unique_rows(keys, 6, vertex_count)
+        else:
+            vertex_remap, vertex_source = self._unique_rows(module_info.vertex_data, 3, vertex_count)
+        uv_remap, uv_source = self._unique_rows(module_info.uv_data, 2, uv_count)
+
+        face_data = module_info.face_data
+        faces = array('H')
+        for start in range(0, len(face_data) - 9, 10):
+            a, b, c, d, e, f, g, h, i, j = face_data[start:start + 10]
+            if max(g, h, i) >= vertex_count or max(a, b, c) >= uv_count:
+                continue
+            g, h, i = vertex_remap[g], vertex_remap[h], vertex_remap[i]
+            if drop_degenerate and (g == h or h == i or g == i):
+                continue
+            faces.extend((uv_remap[a], uv_remap[b], uv_remap[c], d, e, f, g, h, i, j))
+
+        if drop_unused:
+            # 只保留仍被面片引用的顶点/UV, 按首次引用的顺序重新编号
+            vertex_compact = dict.fromkeys(faces[start + k] for start in range(0, len(faces), 10) for k in (6, 7, 8))
+            uv_compact = dict.fromkeys(faces[start + k] for start in range(0, len(faces), 10) for k in (0, 1, 2))
+            vertex_source = [vertex_source[row] for row in vertex_compact]
+            uv_source = [uv_source[row] for row in uv_compact]
+            vertex_compact = {row: new for new, row in enumerate(vertex_compact)}
+            uv_compact = {row: new for new, row in enumerate(uv_compact)}
+            for start in range(0, len(faces), 10):
+                for k in (0, 1, 2):
+                    faces[start + k] = uv_compact[faces[start + k]]
+                for k in (6, 7, 8):
+                    faces[start + k] = vertex_compact[faces[start + k]]
+
+        welded = module()
+        for name in module.__slots__:
+            setattr(welded, name, getattr(module_info, name))
+        welded.vertex_data = self._gather_rows(module_info.vertex_data, 3, vertex_source)
+        if per_vertex_normals:
+            welded.normal_data = self._gather_rows(module_info.normal_data, 3, vertex_source)
+        welded.uv_data = self._gather_rows(module_info.uv_data, 2, uv_source)
+        welded.face_data = faces
+        welded.vertex_num = len(vertex_source)
+        welded.uvs_num = len(uv_source)
+        welded.faces_num = len(faces) // 10
+        return welded
+
+    def _cluster_faces(self, faces, cells):
+        """Faces (as cluster triples) that keep three distinct clusters, without duplicates."""
+        kept = {}
+        for face, (g, h, i) in enumerate(faces):
+            g, h, i = cells[g], cells[h], cells[i]
+            if g != h and h != i and g != i:
+                kept.setdefault(tuple(sorted((g, h, i))), face)
+        return kept
+
+    def decimate_module(self, module_info: module, ratio):
+        """
+        Simplify a module by vertex clustering to about `ratio` of its triangles.
+
+        Vertices are snapped to a uniform grid over the module's bounding box
+        and each occupied cell becomes one vertex at the mean position; the
+        grid resolution is searched so the surviving triangle count is as
+        close to the target as possible without exceeding it. Vertices on a
+        UV seam (one position used with different UVs) are only merged with
+        other seam vertices, and every corner keeps its original UV index, so
+        seams stay where they are and texturing stays intact.
+
+        Args:
+            module_info: decoded module, left unchanged
+            ratio: target fraction of triangles, 0 < ratio < 1
+
+        Returns:
+            New module (compacted with weld_module) sharing the metadata of module_info
+        """
+        if not 0.0 < ratio < 1.0:
+            raise ValueError(f"LOD比例必须在0和1之间: {ratio}")
+        vertex_count = min(module_info.vertex_num, len(module_info.vertex_data) // 3)
+        uv_count = len(module_info.uv_data) // 2
+        face_data = module_info.face_data
+        faces, uv_faces, extra = [], [], []
+        for start in range(0, len(face_data) - 9, 10):
+            a, b, c, d, e, f, g, h, i, j = face_data[start:start + 10]
+            if max(g, h, i) < vertex_count and max(a, b, c) < uv_count:
+                faces.append((g, h, i))
+                uv_faces.append((a, b, c))
+                extra.append((d, e, f, j))
+        target = int(len(faces) * ratio)
+
+        # UV接缝上的顶点: 同一位置索引在不同面片中对应不同的UV值
+        uvs = list(module_info.uvs)
+        corner_uv = {}
+        seams = set()
+        for corners, uv_corners in zip(faces, uv_faces):
+            for vertex, uv in zip(corners, uv_corners):
+                if corner_uv.setdefault(vertex, uvs[uv]) != uvs[uv]:
+                    seams.add(vertex)
+
+        vertices = module_info.vertex[:vertex_count]
+        low = [min(vertex[k] for vertex in vertices) for k in range(3)] if vertices else [0.0] * 3
+        span = [max(max(vertex[k] for vertex in vertices) - low[k], 1e-12) for k in range(3)] if vertices \
+            else [1.0] * 3
+
+        def clusters(resolution):
+            cells, slots = [], {}
+            for index, (x, y, z) in enumerate(vertices):
+                # 接缝顶点只与同一格内的接缝顶点合并, 不会被拉进UV岛内部
+                key = (index in seams,
+                       min(int((x - low[0]) / span[0] * resolution), resolution - 1),
+                       min(int((y - low[1]) / span[1] * resolution), resolution - 1),
+                       min(int((z - low[2]) / span[2] * resolution), resolution - 1))
+                cells.append(slots.setdefault(key, len(slots)))
+            return cells, len(slots)
+
+        # 分辨率越高保留的三角形越多: 二分查找不超过目标的最高分辨率
+        # 超过目标时记录最接近目标的结果, 避免小模型被简化成空网格
+        best = above = None
+        lo, hi = 1, self.LOD_MAX_RESOLUTION
+        while lo <= hi:
+            resolution = (lo + hi) // 2
+            cells, cluster_count = clusters(resolution)
+            kept = self._cluster_faces(faces, cells)
+            if len(kept) <= target:
+                if best is None or len(kept) >= len(best[2]):
+                    best = (cells, cluster_count, kept)
+                lo = resolution + 1
+            else:
+                if above is None or len(kept) < len(above[2]):
+                    above = (cells, cluster_count, kept)
+                hi = resolution - 1
+        if best is None or not best[2] and above is not None:
+            best = above
+        cells, cluster_count, kept = best
+
+        # 每个簇取所有顶点的平均位置, 每顶点法线取平均后归一化
+        sums = [[0.0, 0.0, 0.0, 0] for _ in range(cluster_count)]
+        for (x, y, z), cell in zip(vertices, cells):
+            total = sums[cell]
+            total[0] += x
+            total[1] += y
+            total[2] += z
+            total[3] += 1
+        per_vertex_normals = len(module_info.normal_data) == vertex_count * 3
+        normal_sums = [[0.0, 0.0, 0.0] for _ in range(cluster_count)] if per_vertex_normals else None
+        if per_vertex_normals:
+            for (x, y, z), cell in zip(module_info.normals, cells):
+                total = normal_sums[cell]
+                total[0] += x
+                total[1] += y
+                total[2] += z
+
+        decimated = module()
+        for name in module.__slots__:
+            setattr(decimated, name, getattr(module_info, name))
+        decimated.vertex_data = array('f', chain.from_iterable(
+            (x / count, y / count, z / count) if count else (x, y, z) for x, y, z, count in sums))
+        if per_vertex_normals:
+            normals = []
+            for x, y, z in normal_sums:
+                length = (x * x + y * y + z * z) ** 0.5 or 1.0
+                normals += (x / length, y / length, z / length)
+            decimated.normal_data = array('f', normals)
+        decimated.face_data = array('H', chain.from_iterable(
+            (*uv_faces[face][:3], *extra[face][:3], cells[faces[face][0]], cells[faces[face][1]],
+             cells[faces[face][2]], extra[face][3]) for face in sorted(kept.values())))
+        decimated.vertex_num = cluster_count
+        decimated.faces_num = len(kept)
+        return self.weld_module(decimated)
+
+    def lod_modules(self, module_info: module):
+        """Simplified copies of a module for every ratio in lod_ratios (lod1, lod2, ...)."""
+        with self.profile.stage("lod", modules=1) as counters:
+            levels = [self.decimate_module(module_info, ratio) for ratio in self.lod_ratios]
+            counters["faces"] = sum(level.faces_num for level in levels)
+        return levels
+
+    def _create_lod_files(self, module_info: module):
+        """
+        Write <name>_<id>_lod{n}.obj for every level of lod_modules.
+
+        The files are listed in output_files like the module OBJs, so levels
+        a later run no longer writes are removed through the manifest.
+        """
+        for level, lod_module in enumerate(self.lod_modules(module_info), 1):
+            self._create_obj_file(lod_module, f"{module_info.name}_{module_info.id}_lod{level}.obj")
+
+    @classmethod
+    def _round_bound(cls, value, up):
+        """Round value to BOUNDS_STEP, up or down, so the rounded box/sphere still contains it."""
+        steps = round(value / cls.BOUNDS_STEP)
+        while True:
+            bound = round(steps * cls.BOUNDS_STEP, 6)
+            # 取整后落在value的另一侧时向外移一步
+            if (bound >= value) if up else (bound <= value):
+                return bound
+            steps += 1 if up else -1
+
+    @classmethod
+    def _bounds_from_columns(cls, xs, ys, zs):
+        """
+        Box, sphere around the box center and centroid of points given as x, y, z columns.
+
+        min is rounded down, max and radius up (the radius is measured from
+        the rounded center), so the stored box and sphere contain every point.
+        Points with a NaN or infinite coordinate are left out; None when no
+        finite point remains.
+        """
+        if not all(map(math.isfinite, chain(xs, ys, zs))):
+            points = [point for point in zip(xs, ys, zs) if all(map(math.isfinite, point))]
+            if not points:
+                return None
+            xs, ys, zs = zip(*points)
+        count = len(xs)
+        low = [cls._round_bound(min(column), False) for column in (xs, ys, zs)]
+        high = [cls._round_bound(max(column), True) for column in (xs, ys, zs)]
+        cx, cy, cz = center = [round((l + h) / 2, 6) for l, h in zip(low, high)]
+        radius = max((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2 for x, y, z in zip(xs, ys, zs)) ** 0.5
+        return {"min": low, "max": high, "center": center, "radius": cls._round_bound(radius, True),
+                "centroid": [round(sum(column) / count, 6) for column in (xs, ys, zs)]}
+
+    def module_bounds(self, module_info: module):
+        """
+        Spatial metadata of one module for the bounds sidecar.
+
+        "local" is measured on the vertices as exported (after weld_module
+        when welding is on), "world" after base_matrix and sub_matrix (the
+        coordinates written to the OBJ). Each holds an axis-aligned box
+        (min/max), a bounding sphere (center of the box and radius) and the
+        vertex centroid; both are None for modules without finite vertices.
+        Vertices with non-finite coordinates are skipped with a warning.
+        """
+        count = min(module_info.vertex_num, len(module_info.vertex_data) // 3)
+        entry = {"name": module_info.name, "id": module_info.id, "vertices": count,
+                 "local": None, "world": None}
+        if not count:
+            return entry
+        data = module_info.vertex_data
+        if not all(map(math.isfinite, data[:count * 3])):
+            logging.warning(f"模块 {module_info.name}_{module_info.id} 含有非有限坐标的顶点, 包围信息中忽略这些顶点")
+        entry["local"] = self._bounds_from_columns(data[0:count * 3:3], data[1:count * 3:3], data[2:count * 3:3])
+        if not module_info.transform or module_info.transform == IDENTITY_TRANSFORM:
+            entry["world"] = entry["local"]
+        else:
+            points = self.transform_points(module_info.transform, module_info.vertex[:count])
+            entry["world"] = self._bounds_from_columns(*zip(*points))
+        return entry
+
+    def build_bvh(self, bounds_list):
+        """
+        Build a bounding volume hierarchy over the world boxes of module_bounds entries.
+
+        Nodes are split at the median of the box centers along their longest
+        axis. Returns a flat node list with the root first; inner nodes have
+        "children" (two node indices), leaves have "module" (an index into
+        bounds_list), and every node has its "min"/"max" box.
+        """
+        nodes = []
+
+        def build(items):
+            node = {"min": [min(entry["world"]["min"][k] for _, entry in items) for k in range(3)],
+                    "max": [max(entry["world"]["max"][k] for _, entry in items) for k in range(3)]}
+            nodes.append(node)
+            position = len(nodes) - 1
+            if len(items) == 1:
+                node["module"] = items[0][0]
+                return position
+            centers = [entry["world"]["center"] for _, entry in items]
+            axis = max(range(3), key=lambda k: max(c[k] for c in centers) - min(c[k] for c in centers))
+            items = sorted(items, key=lambda item: item[1]["world"]["center"][axis])
+            middle = len(items) // 2
+            node["children"] = [build(items[:middle]), build(items[middle:])]
+            return position
+
+        items = [(position, entry) for position, entry in enumerate(bounds_list) if entry["world"] is not None]
+        if items:
+            build(items)
+        return nodes
+
+    def build_bounds(self, bounds_list):
+        """Sidecar content: module bounds, the scene box/sphere and the module BVH."""
+        bvh = self.build_bvh(bounds_list)
+        scene = None
+        if bvh:
+            low, high = bvh[0]["min"], bvh[0]["max"]
+            center = [round((l + h) / 2, 6) for l, h in zip(low, high)]
+            # 从取整后的中心到最远的角
+            radius = sum(max(c - l, h - c) ** 2 for l, h, c in zip(low, high, center)) ** 0.5
+            scene = {"min": low, "max": high, "center": center, "radius": self._round_bound(radius, True)}
+        return {"format_version": 1, "modules": bounds_list, "scene": scene, "bvh": bvh}
+
+    def _create_bounds_file(self, bounds_list):
+        """写入模块包围盒及BVH的JSON文件"""
+        filename = "bounds.json"
+        filepath = os.path.join(self.output_dir, filename)
+        with open(filepath, 'w', encoding='utf-8') as bounds_file:
+            json.dump(self.build_bounds(bounds_list), bounds_file, separators=(',', ':'))
+        logging.info(f"生成bounds_file ok: {filepath}")
+        self.output_files.append(filename)
+        return filepath
+
+    def _weld_for_export(self, module_info: module):
+        """weld_module with the removed vertex/UV/face counts recorded in the profile."""
+        with self.profile.stage("weld", modules=1) as counters:
+            welded = self.weld_module(module_info)
+            counters.update(vertices_removed=module_info.vertex_num - welded.vertex_num,
+                            uvs_removed=len(module_info.uv_data) // 2 - welded.uvs_num,
+                            faces_removed=module_info.faces_num - welded.faces_num)
+        return welded
+
     def convert_magenta_to_transparent(self, input_path, output_path):
         """将图像中的洋红色(255,0,255)转换为透明"""
+        # PIL只在真正处理贴图时才导入
+        from PIL import Image, ImageChops
         try:
-            # 打开图像并转换为RGBA模式
+            # 打开图像并转换为RGBA模式 (input_path/output_path也可以是文件对象)
             img = Image.open(input_path).convert("RGBA")
-            data = img.getdata()
-
-            # 创建新的像素数据
-            new_data = []
-            for item in data:
-                # 检查是否为洋红色(255,0,255)
-                if item[0] > 250 and item[1] < 5 and item[2] > 250:
-                    # 设置为完全透明
-                    new_data.append((0, 0, 0, 0))
-                else:
-                    # 保持原样
-                    new_data.append(item)
+            red, green, blue, _ = img.split()
 
-            # 更新图像数据
-            img.putdata(new_data)
+            # 整个通道一次查表: R>250, G<5, B>250 的像素掩码为255
+            mask = ImageChops.multiply(
+                ImageChops.multiply(red.point(lambda v: 255 if v > 250 else 0),
+                                    green.point(lambda v: 255 if v < 5 else 0)),
+                blue.point(lambda v: 255 if v > 250 else 0))
+
+            # 洋红色像素设置为完全透明, 其余保持原样
+            img.paste((0, 0, 0, 0), mask=mask)
             img.save(output_path, "PNG")
             logging.info(f"成功将 {input_path} 的洋红色转换为透明")
             return True
@@ -235,14 +1200,6 @@ class Model1SToOBJ:
         value = struct.unpack_from('<f', data, index)[0]
         return value, index + 4
 
-    def _read_string(self, data, index):
-        """Read a UTF-16LE string from data at given index."""
-        # First read the string length
-        length, index = self._read_int16(data, index)
-        # Then read the string data (including null terminator)
-        string_data = data[index:index+2+length*2].decode('utf-16le').strip('\x00')
-        return string_data, index + 2 + length*2
-
     def _read_vertex(self, data, index):
         """Read a vertex (3 floats) from data."""
         x, index = self._read_float(data, index)
@@ -250,6 +1207,143 @@ class Model1SToOBJ:
         z, index = self._read_float(data, index)
         return (x, y, z), index
 
+    def _read_array(self, data, index, typecode, record, count):
+        """
+        Read `count` fixed-size records as a flat typed array.
+
+        With map_geometry (on little-endian hosts) the result is a memoryview
+        cast over data itself; otherwise the block is copied in one step.
+        """
+        end = index + record.size * count
+        if end > len(data):
+            raise struct.error(f"需要 {end - index} 字节, 数据只剩 {len(data) - index} 字节")
+        block = memoryview(data)[index:end]
+        if self.map_geometry and sys.byteorder == 'little':
+            return block.cast(typecode), end
+        return _array_from_buffer(typecode, block), end
+
+    def _read_geometry(self, data, index, back_module, vertex_count):
+        """Decode vertices, normals, UVs and faces one value at a time."""
+        # Read vertices
+        vertices = []
+        for _ in range(vertex_count):
+            if index + 12 > len(data):  # Prevent out of bounds
+                logging.warning(f"顶点数据不完整，已到达数据末尾")
+                break
+            vertex, index = self._read_vertex(data, index)
+            vertices.append(vertex)
+        back_module.vertex = vertices
+
+        # Read normals
+        normal_count, index = self._read_int32(data, index)
+        normals = []
+        for _ in range(normal_count):
+            normal, index = self._read_vertex(data, index)
+            normals.append(normal)
+        back_module.normals = normals
+
+        # Read UV coordinates
+        uv_count, index = self._read_int16(data, index)
+        logging.debug(f"UV坐标数量: {uv_count}")
+        index += 2  # Skip unknown 2 bytes
+
+        uvs = []
+        for _ in range(uv_count):
+            # Read vertex and texture block IDs
+            vertex_id, index = self._read_int16(data, index)
+            tex_block, index = self._read_int16(data, index)
+
+            # Read U and V coordinates
+            u, index = self._read_float(data, index)
+            v, index = self._read_float(data, index)
+            v = 1.0 - v  # Flip V coordinate (OpenGL -> DirectX convention)
+
+            uvs.append((u, v))
+
+        back_module.uvs = uvs
+        back_module.uvs_num = uv_count
+
+        # Read faces
+        face_count, index = self._read_int16(data, index)
+        logging.debug(f"面片数量: {face_count}")
+        index += 2  # Skip unknown 2 bytes
+
+        faces = []
+        for face_idx in range(face_count):
+            # Each face has 10 indices (possibly some are UVs, normals, etc.)
+            indices = []
+            for _ in range(10):
+                idx, index = self._read_int16(data, index)
+                indices.append(idx)
+
+            # Use face index as material ID
+            material_id = face_idx
+            faces.append(tuple(indices + [material_id]))
+
+        back_module.faces = faces
+        back_module.faces_num = face_count
+
+        return index
+
+    def _read_geometry_bulk(self, data, index, back_module, vertex_count):
+        """Decode vertices, normals, UVs and faces block by block.
+
+        Produces exactly the same values as the per-value loops in
+        _read_geometry, but each block is read into a typed array at once
+        (see _read_array; UVs are always copied to flip V).
+        """
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        # Read vertices (clamped to the available data, like the scalar path)
+        available = max(0, (len(data) - index) // self.VERTEX_RECORD.size)
+        if vertex_count > available:
+            logging.warning(f"顶点数据不完整，已到达数据末尾")
+            vertex_count = available
+        back_module.vertex_data, index = self._read_array(data, index, 'f', self.VERTEX_RECORD, vertex_count)
+
+        # Read normals
+        (normal_count,), index = self.SCHEMA.read("normal_header", data, index)
+        back_module.normal_data, index = self._read_array(data, index, 'f', self.VERTEX_RECORD, normal_count)
+
+        # Read UV coordinates: each record is (vertex_id, tex_block) packed in
+        # the first float slot, then u and v
+        (uv_count,), index = self.SCHEMA.read("uv_header", data, index)
+        if debug:
+            logging.debug(f"UV坐标数量: {uv_count}")
+        uv_records, index = self._read_array(data, index, 'f', self.UV_RECORD, uv_count)
+        uvs = array('d', bytes(16 * uv_count))
+        uvs[0::2] = array('d', uv_records[1::3])
+        # Flip V coordinate (OpenGL -> DirectX convention)
+        uvs[1::2] = array('d', [1.0 - v for v in uv_records[2::3]])
+        back_module.uv_data = uvs
+        back_module.uvs_num = uv_count
+
+        # Read faces (material ID is the face index and is not stored)
+        (face_count,), index = self.SCHEMA.read("face_header", data, index)
+        if debug:
+            logging.debug(f"面片数量: {face_count}")
+        back_module.face_data, index = self._read_array(data, index, 'H', self.FACE_RECORD, face_count)
+        back_module.faces_num = face_count
+
+        return index
+
+    def _skip_geometry(self, data, index, back_module, vertex_count):
+        """Read only the geometry counts and skip over the geometry blocks."""
+        back_module.vertex_num = vertex_count
+        index += self.VERTEX_RECORD.size * vertex_count
+
+        (normal_count,), index = self.SCHEMA.read("normal_header", data, index)
+        index += self.VERTEX_RECORD.size * normal_count
+
+        (uv_count,), index = self.SCHEMA.read("uv_header", data, index)
+        back_module.uvs_num = uv_count
+        index += self.UV_RECORD.size * uv_count
+
+        (face_count,), index = self.SCHEMA.read("face_header", data, index)
+        back_module.faces_num = face_count
+        index += self.FACE_RECORD.size * face_count
+
+        return index
+
     def process_module(self, data, index, is_sub_module=False, back_module=None):
         """
         Process a single module from the binary data.
@@ -263,23 +1357,27 @@ class Model1SToOBJ:
         Returns:
             Updated index after processing the module
         """
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         # Initialize module if not provided
         if back_module is None:
             back_module = module()
 
-        # Skip header
+        schema = self.SCHEMA
         start_offset = index
-        index += len(self.MODEL_HEADER)
 
         # Parse module basic information
         try:
-            # Read module ID
-            module_id, index = self._read_int16(data, index)
-            logging.debug(f"当前模块id: {module_id}")
-
-            # Read module name
-            module_name, index = self._read_string(data, index)
-            logging.debug(f"当前模块名: {module_name}")
+            # Read header, module ID and name length in one go
+            (_, module_id, name_length), index = schema.read("module_header", data, index)
+            if debug:
+                logging.debug(f"当前模块id: {module_id}")
+
+            # Read module name (2B terminator first, then UTF-16LE characters)
+            name_end = index + 2 + name_length * 2
+            module_name = data[index:name_end].decode('utf-16le').strip('\x00')
+            index = name_end
+            if debug:
+                logging.debug(f"当前模块名: {module_name}")
 
             # Assign ID and name based on whether this is a submodule
             if is_sub_module:
@@ -290,116 +1388,57 @@ class Model1SToOBJ:
                 back_module.name = module_name
 
             # Check if this module has submodules
-            has_submodule, index = self._read_int16(data, index)
+            (has_submodule,), index = schema.read("module_flags", data, index)
 
             if has_submodule:
-                logging.debug(f"Module {module_id} has submodules, entering recursion...")
-                # Skip 2 bytes and process the submodule
-                index = self.process_module(data, index+2, True, back_module)
+                if debug:
+                    logging.debug(f"Module {module_id} has submodules, entering recursion...")
+                index = self.process_module(data, index, True, back_module)
             else:
-                # Skip 2 unknown bytes
-                index += 2
-
-                # Parse transformation matrix (84 bytes)
-                matrix_data = data[index:index+84]
-                base_matrix, base_params_group1, base_params_group2 = self.parse_transform_matrix(matrix_data)
+                # Parse transformation matrix (21 floats) and skip the unknown data after it
+                (matrix,), index = schema.read("base_matrix", data, index)
+                base_matrix, base_params_group1, base_params_group2 = self._split_transform_matrix(matrix)
                 back_module.base_matrix = base_matrix
                 back_module.base_params_group1 = base_params_group1
                 back_module.base_params_group2 = base_params_group2
-                index += 84
-                index += 50  # Skip unknown data
 
                 # Look for vertex coordinate header
                 if data[index:index+2] != self.VERTEX_COORDINATES_HEADER:
-                    logging.debug(f"没找到顶点坐标头标识 (0xAA27) at offset 0x{index:X}")
+                    if debug:
+                        logging.debug(f"没找到顶点坐标头标识 (0xAA27) at offset 0x{index:X}")
                 else:
-                    logging.debug(f"找到顶点坐标头标识 at offset 0x{index:X}")
-                    index += 2
+                    if debug:
+                        logging.debug(f"找到顶点坐标头标识 at offset 0x{index:X}")
 
-                    # Process geometry data
-                    # Read bone ID
-                    bone_id, index = self._read_int16(data, index)
+                    # Process geometry data: bone ID and vertex count
+                    (_, bone_id, vertex_count), index = schema.read("geometry_header", data, index)
                     back_module.bone_id = bone_id
-                    logging.debug(f"骨骼ID: {bone_id}")
-
-                    # Read vertex count
-                    vertex_count, index = self._read_int16(data, index)
                     back_module.vertex_num = vertex_count
-                    logging.debug(f"顶点数量: {vertex_count}")
-                    index += 2  # Skip unknown 2 bytes
-
-                    # Read vertices
-                    vertices = []
-                    for _ in range(vertex_count):
-                        if index + 12 > len(data):  # Prevent out of bounds
-                            logging.warning(f"顶点数据不完整，已到达数据末尾")
-                            break
-                        vertex, index = self._read_vertex(data, index)
-                        vertices.append(vertex)
-                    back_module.vertex = vertices
-
-                    # Read normals
-                    normal_count, index = self._read_int32(data, index)
-                    normals = []
-                    for _ in range(normal_count):
-                        normal, index = self._read_vertex(data, index)
-                        normals.append(normal)
-                    back_module.normals = normals
-
-                    # Read UV coordinates
-                    uv_count, index = self._read_int16(data, index)
-                    logging.debug(f"UV坐标数量: {uv_count}")
-                    index += 2  # Skip unknown 2 bytes
-
-                    uvs = []
-                    for _ in range(uv_count):
-                        # Read vertex and texture block IDs
-                        vertex_id, index = self._read_int16(data, index)
-                        tex_block, index = self._read_int16(data, index)
-
-                        # Read U and V coordinates
-                        u, index = self._read_float(data, index)
-                        v, index = self._read_float(data, index)
-                        v = 1.0 - v  # Flip V coordinate (OpenGL -> DirectX convention)
-
-                        uvs.append((u, v))
-
-                    back_module.uvs = uvs
-                    back_module.uvs_num = uv_count
-
-                    # Read faces
-                    face_count, index = self._read_int16(data, index)
-                    logging.debug(f"面片数量: {face_count}")
-                    index += 2  # Skip unknown 2 bytes
-
-                    faces = []
-                    for face_idx in range(face_count):
-                        # Each face has 10 indices (possibly some are UVs, normals, etc.)
-                        indices = []
-                        for _ in range(10):
-                            idx, index = self._read_int16(data, index)
-                            indices.append(idx)
-
-                        # Use face index as material ID
-                        material_id = face_idx
-                        faces.append(tuple(indices + [material_id]))
-
-                    back_module.faces = faces
-                    back_module.faces_num = face_count
+                    if debug:
+                        logging.debug(f"骨骼ID: {bone_id}")
+                        logging.debug(f"顶点数量: {vertex_count}")
+
+                    if not self.decode_geometry:
+                        index = self._skip_geometry(data, index, back_module, vertex_count)
+                    elif self.bulk_decode:
+                        index = self._read_geometry_bulk(data, index, back_module, vertex_count)
+                    else:
+                        index = self._read_geometry(data, index, back_module, vertex_count)
 
                 # For submodules, read additional transformation matrices
                 if is_sub_module:
-                    matrix_data = data[index:index+84]
-                    sub_matrix, sub_params_group1, sub_params_group2 = self.parse_transform_matrix(matrix_data)
+                    (matrix,), index = schema.read("sub_matrix", data, index)
+                    sub_matrix, sub_params_group1, sub_params_group2 = self._split_transform_matrix(matrix)
 
                     back_module.sub_matrix = sub_matrix
                     back_module.sub_params_group1 = sub_params_group1
                     back_module.sub_params_group2 = sub_params_group2
 
-                    index += 84
-                    index += 46  # Skip unknown data
+            if not is_sub_module:
+                back_module.transform = self.compose_transform(back_module)
 
-            logging.debug(f"完成处理模块 {module_name} (ID: {module_id}) at offset 0x{index:X}")
+            if debug:
+                logging.debug(f"完成处理模块 {module_name} (ID: {module_id}) at offset 0x{index:X}")
 
         except Exception as e:
             logging.error(f"处理模块时出错 at offset 0x{index:X}: {str(e)}")
@@ -407,9 +1446,109 @@ class Model1SToOBJ:
 
         return index
 
+    def scan_headers(self, data):
+        """
+        Locate every FILE_HEADER, BASE_MODEL_HEADER and MODEL_HEADER in one pass.
+
+        Returns:
+            List of (offset, header_name) tuples ordered by offset
+        """
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        header_table = [(match.start(), self.HEADER_NAMES[match.group()])
+                        for match in self.HEADER_PATTERN.finditer(data)]
+        if debug:
+            logging.debug(f"找到 {len(header_table)} 个头标识: "
+                          + ", ".join(f"{name}@0x{offset:X}" for offset, name in header_table))
+        return header_table
+
+    def iter_modules(self, data):
+        """
+        Decode the top-level modules of a model.1s buffer in file order.
+
+        Args:
+            data: bytes, mmap or other buffer holding the whole file
+
+        Yields:
+            (start_offset, module) for each module, where start_offset is the
+            position of the module header passed to process_module
+        """
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        with self.profile.stage("header_scan", bytes=len(data)) as counters:
+            self.header_table = self.scan_headers(data)
+            counters["headers"] = len(self.header_table)
+        # 只有文件头和基础模块头是解析入口, 模块头由process_module自行跳过
+        entry_table = [(offset, name) for offset, name in self.header_table if name != "model"]
+        entry_offsets = [offset for offset, _ in entry_table]
+        pos = 0
+
+        while pos < len(entry_table):
+            index, header_name = entry_table[pos]
+            # 检测文件头
+            if header_name == "file":
+                (_, total_modules), index = self.SCHEMA.read("file_header", data, index)
+                if debug:
+                    logging.debug(f"Total modules declared: {total_modules}")
+                    logging.debug(f"begin1当前index 位置: @{index:X}")
+            elif debug:
+                logging.debug(f"begin2当前index 位置: @{index:X}")
+            if debug:
+                logging.debug(f"index 前数值: {data[index - 4:index]}")
+
+            start_offset = index
+            model_obj = module()
+            with self.profile.stage("module_decode", modules=1) as counters:
+                index = self.process_module(data, index, False, model_obj)
+                counters.update(bytes=index - start_offset, vertices=model_obj.vertex_num,
+                                faces=model_obj.faces_num)
+            yield start_offset, model_obj
+
+            # 跳到当前模块结束位置之后的下一个入口
+            pos = bisect_left(entry_offsets, index, pos + 1)
+
+    def iter_modules_parallel(self, input_path, data=None, workers=None):
+        """
+        Decode the top-level modules of a model.1s file on worker processes.
+
+        The module entry offsets are found first by walking the headers
+        without decoding geometry (like Model1SReader). Each worker maps the
+        file itself, so only offsets go to the workers and only decoded
+        modules come back.
+
+        Args:
+            input_path: model.1s path the workers map
+            data: content of input_path if already loaded or mapped
+            workers: number of worker processes (None uses the CPU count)
+
+        Yields:
+            (start_offset, module) in file order, like iter_modules
+        """
+        if data is None:
+            with open(input_path, 'rb') as f:
+                data = f.read()
+        with self.profile.stage("module_index") as counters:
+            index_converter = Model1SToOBJ(decode_geometry=False)
+            offsets = [offset for offset, _ in index_converter.iter_modules(data)]
+            self.header_table = index_converter.header_table
+            counters["modules"] = len(offsets)
+        if not offsets:
+            return
+
+        workers = min(workers or os.cpu_count() or 1, len(offsets))
+        # 每个进程分几批, 大小不一的模块也能分得比较均匀
+        chunk_size = max(1, -(-len(offsets) // (workers * 4)))
+        chunks = [offsets[start:start + chunk_size] for start in range(0, len(offsets), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_decode_worker,
+                                 initargs=(input_path, self.bulk_decode)) as executor:
+            for chunk, modules in zip(chunks, executor.map(_decode_modules_job, chunks)):
+                for start_offset, model_obj in zip(chunk, modules):
+                    self.profile.add("module_decode", 0.0, modules=1, vertices=model_obj.vertex_num,
+                                     faces=model_obj.faces_num)
+                    yield start_offset, model_obj
+
     def convert(self, input_path, output_dir):
         """主转换函数"""
         self.output_dir = output_dir
+        self.output_files = []
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
         logging.debug(f"\n{'='*40}")
@@ -417,49 +1556,82 @@ class Model1SToOBJ:
         logging.debug(f"Output Directory: {output_dir}")
         logging.debug(f"{'='*40}\n")
         module_list = []
-        with open(input_path, 'rb') as f:
-            data = f.read()
+        lod_list = []
+        bounds_list = []
+        with self.profile.stage("file_read", files=1) as counters:
+            with open(input_path, 'rb') as f:
+                if self.streaming or self.decode_workers > 1:
+                    try:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except ValueError:
+                        # 空文件无法映射
+                        data = b''
+                else:
+                    data = f.read()
+            counters["bytes"] = len(data)
 
         index = 0
-        total_modules = 0
-
+        merged_file = self._open_merged_obj_file() if self.output_format == "merged" else None
+        # glb需要全部模块才能输出, 不走写线程
+        writer = None
+        if self.streaming and self.output_format != "glb":
+            writer = _ModuleWriter(self, merged_file)
         try:
-            while index < len(data):
-                # 检测文件头
-                if data[index:index+6] == self.FILE_HEADER:
-                    index += 12
-                    total_modules = int.from_bytes(data[index:index+4], 'little')
-                    logging.debug(f"Total modules declared: {total_modules}")
-                    index += 4
-                    model_obj = module()
-                    logging.debug(f"begin1当前index 位置: @{index:X}")
-                    logging.debug(f"index 前数值: {data[index - 4:index]}")
-
-                    index = self.process_module(data, index, back_module=model_obj)
-                    #logging.debug(f"model_obj:{model_obj}")
-                    self._create_obj_file(model_obj)
-                    module_list.append(model_obj)
-                    total_modules -= 1
-
-                elif data[index:index+6] == self.BASE_MODEL_HEADER:
-                    logging.debug(f"begin2当前index 位置: @{index:X}")
-                    logging.debug(f"index 前数值: {data[index - 4:index]}")
-                    model_obj = module()
-                    index = self.process_module(data, index, False, model_obj)
-                    #logging.debug(f"model_obj:{model_obj}")
+            if self.decode_workers > 1:
+                modules = self.iter_modules_parallel(input_path, data, self.decode_workers)
+            else:
+                modules = self.iter_modules(data)
+            for index, model_obj in modules:
+                #logging.debug(f"model_obj:{model_obj}")
+                if self.weld:
+                    model_obj = self._weld_for_export(model_obj)
+                if self.bounds:
+                    with self.profile.stage("bounds", modules=1):
+                        bounds_list.append(self.module_bounds(model_obj))
+                if writer is not None:
+                    # 只保留模块摘要, 几何数据写出后即可释放
+                    module_list.append(ModuleIndexEntry(index, model_obj.id, model_obj.name, model_obj.sub_id,
+                                                        model_obj.sub_name, model_obj.vertex_num,
+                                                        model_obj.uvs_num, model_obj.faces_num))
+                    writer.submit(model_obj)
+                    continue
+                if self.output_format == "obj":
                     self._create_obj_file(model_obj)
-                    module_list.append(model_obj)
-                    total_modules -= 1
-                else:
-                    index += 1
-            self._create_mtl_file(file_name="test")
+                elif merged_file is not None:
+                    self._write_merged_module(merged_file, model_obj)
+                if self.lod_ratios:
+                    if self.output_format == "glb":
+                        lod_list.append(self.lod_modules(model_obj))
+                    else:
+                        self._create_lod_files(model_obj)
+                module_list.append(model_obj)
+            if writer is not None:
+                writer.close()
+            if self.output_format == "glb":
+                self._create_glb_file(module_list, lod_list or None)
+            else:
+                self._create_mtl_file(file_name="test")
+            if self.bounds:
+                self._create_bounds_file(bounds_list)
         except Exception as e:
             logging.error(f"Error at offset 0x{index:X}: {str(e)}")
             raise
+        finally:
+            if writer is not None:
+                writer.shutdown()
+            if merged_file is not None:
+                merged_file.close()
+                self.profile.add("obj_write", 0.0, calls=0, files=1, bytes=os.path.getsize(merged_file.name))
+            if isinstance(data, mmap.mmap):
+                try:
+                    data.close()
+                except BufferError:
+                    # 异常栈中仍有引用映射的视图, 交给垃圾回收释放
+                    pass
         self.module_list = module_list
         logging.debug(f"\n{'='*40}")
         logging.debug(f"Conversion completed!")
-        logging.debug(f"Processed modules: {abs(total_modules)}")
+        logging.debug(f"Processed modules: {len(module_list)}")
         logging.debug(f"{'='*40}")
         self.state_print()
 
@@ -470,8 +1642,490 @@ class Model1SToOBJ:
             for now_module in self.module_list:
                 logging.info(f"module_name: {now_module.name},id: {now_module.id}")
 
-def setup_logging():
-    """Configure logging with separate files for debug and info levels."""
+# 并行解码工作进程中映射的model.1s及解码器
+_decode_worker = {}
+
+def _init_decode_worker(input_path, bulk_decode=True):
+    """ProcessPoolExecutor initializer: map input_path once per worker process."""
+    with open(input_path, 'rb') as f:
+        _decode_worker["data"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _decode_worker["converter"] = Model1SToOBJ(bulk_decode=bulk_decode)
+
+def _decode_modules_job(offsets):
+    """Decode the modules starting at the given offsets of the mapped file."""
+    data, converter = _decode_worker["data"], _decode_worker["converter"]
+    modules = []
+    for offset in offsets:
+        model_obj = module()
+        converter.process_module(data, offset, False, model_obj)
+        modules.append(model_obj)
+    return modules
+
+class _ModuleWriter:
+    """
+    Writer threads for Model1SToOBJ.convert in streaming mode.
+
+    submit() blocks once STREAM_QUEUE_SIZE decoded modules are waiting, so
+    the parser never runs far ahead of the disk; a module is dropped as soon
+    as its OBJ (or merged group) has been written.
+    """
+
+    def __init__(self, converter, merged_file=None):
+        self.converter = converter
+        self.merged_file = merged_file
+        # merged格式的分组和索引偏移依赖写入顺序, 只能单线程写
+        threads = 1 if merged_file is not None else max(1, converter.writer_threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="obj-writer")
+        self._slots = threading.BoundedSemaphore(converter.STREAM_QUEUE_SIZE)
+        self._futures = []
+
+    def _write(self, model_obj):
+        try:
+            if self.merged_file is not None:
+                self.converter._write_merged_module(self.merged_file, model_obj)
+            else:
+                self.converter._create_obj_file(model_obj)
+            if self.converter.lod_ratios:
+                self.converter._create_lod_files(model_obj)
+        finally:
+            self._slots.release()
+
+    def _raise_failed(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def submit(self, model_obj):
+        """Queue a module for writing; re-raises the first failed write."""
+        with self.converter.profile.stage("write_queue_wait"):
+            self._slots.acquire()
+        self._raise_failed()
+        # 已完成的写任务不再持有模块
+        self._futures = [future for future in self._futures if not future.done() or future.exception()]
+        self._futures.append(self._executor.submit(self._write, model_obj))
+
+    def close(self):
+        """Wait for every queued module to be written."""
+        self._executor.shutdown(wait=True)
+        self._raise_failed()
+
+    def shutdown(self):
+        """Stop the writers after an error, dropping modules not yet written."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+@dataclass
+class ModuleIndexEntry:
+    offset: int = 0
+    id: int = 0
+    name: str = ""
+    sub_id: int = 0
+    sub_name: str = ""
+    vertex_num: int = 0
+    uvs_num: int = 0
+    faces_num: int = 0
+
+class Model1SReader:
+    """
+    Memory-mapped model.1s reader that decodes modules on demand.
+
+    Opening the reader only walks the module headers and geometry counts to
+    build `index`; a module is decoded when it is accessed, and nothing is
+    cached. Its vertex, normal and face arrays are memoryviews over the
+    mapping rather than copies (UVs are copied, V is flipped on decode), so
+    a loaded module stays valid after close() and keeps the mapping alive
+    until it is released.
+
+    Usage:
+        with Model1SReader("model.1s") as reader:
+            seat = reader.find("seat")
+    """
+
+    def __init__(self, input_path):
+        self.input_path = input_path
+        self._file = open(input_path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._data = b''
+        self._converter = Model1SToOBJ(map_geometry=True)
+        self.index = self._build_index()
+
+    def _build_index(self):
+        """Walk the module headers without decoding any geometry."""
+        index_converter = Model1SToOBJ(decode_geometry=False)
+        index = [ModuleIndexEntry(offset, model_obj.id, model_obj.name, model_obj.sub_id,
+                                  model_obj.sub_name, model_obj.vertex_num, model_obj.uvs_num,
+                                  model_obj.faces_num)
+                 for offset, model_obj in index_converter.iter_modules(self._data)]
+        logging.debug(f"{self.input_path}: 索引到 {len(index)} 个模块")
+        return index
+
+    def names(self):
+        """Return the module names in file order."""
+        return [entry.name for entry in self.index]
+
+    def load(self, entry: ModuleIndexEntry):
+        """Decode the module described by an index entry."""
+        model_obj = module()
+        self._converter.process_module(self._data, entry.offset, False, model_obj)
+        return model_obj
+
+    def find(self, name):
+        """Decode the first module with the given name, or None."""
+        for entry in self.index:
+            if entry.name == name:
+                return self.load(entry)
+        return None
+
+    def get(self, module_id):
+        """Decode the module with the given id, or None."""
+        for entry in self.index:
+            if entry.id == module_id:
+                return self.load(entry)
+        return None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, position):
+        return self.load(self.index[position])
+
+    def __iter__(self):
+        for entry in self.index:
+            yield self.load(entry)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            try:
+                self._data.close()
+            except BufferError:
+                # 仍有模块引用映射中的数据, 映射在这些模块释放后关闭
+                pass
+        self._data = b''
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+@dataclass
+class Model:
+    modules: list = field(default_factory=list)
+    header_table: list = field(default_factory=list)
+
+def parse_bytes(data):
+    """
+    Decode a whole model.1s held in memory.
+
+    Args:
+        data: bytes, bytearray, mmap or memoryview with the file content
+
+    Returns:
+        Model with the decoded top-level modules in file order
+    """
+    converter = Model1SToOBJ()
+    modules = [model_obj for _, model_obj in converter.iter_modules(data)]
+    return Model(modules, converter.header_table)
+
+CACHE_MAGIC = b"M1SCACHE"
+CACHE_FORMAT_VERSION = 1
+# 缓存文件中按JSON保存的模块字段(元组存为数组), 几何数组以原始字节保存
+_CACHE_FIELDS = tuple(name for name in module.__slots__ if not name.endswith("_data"))
+_CACHE_ARRAYS = (("vertex_data", 'f'), ("normal_data", 'f'), ("uv_data", 'd'), ("face_data", 'H'))
+
+def _as_tuples(value):
+    """Turn the lists json.load returns back into the tuples the decoder produces."""
+    if isinstance(value, list):
+        return tuple(_as_tuples(item) for item in value)
+    return value
+
+def save_model(model, path):
+    """
+    Write a parsed model to a binary cache file that load_model reads back.
+
+    Layout: CACHE_MAGIC, <II version and JSON length, a JSON header with the
+    header table and every module field (bone_id, params groups, sub ids,
+    transform, ...), then the vertex/normal/UV/face arrays as uncompressed
+    little-endian data, each aligned to 8 bytes so it can be mapped as is.
+    """
+    header = {"converter_version": CONVERTER_FORMAT_VERSION, "header_table": model.header_table, "modules": []}
+    chunks = []
+    position = 0
+    for module_info in model.modules:
+        entry = {name: getattr(module_info, name) for name in _CACHE_FIELDS}
+        entry["arrays"] = {}
+        for name, typecode in _CACHE_ARRAYS:
+            values = array(typecode, getattr(module_info, name))
+            if sys.byteorder == 'big':
+                values.byteswap()
+            position += -position % 8
+            entry["arrays"][name] = [position, len(values)]
+            chunks.append((position, values.tobytes()))
+            position += len(values) * values.itemsize
+        header["modules"].append(entry)
+
+    json_chunk = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(CACHE_MAGIC + struct.pack('<II', CACHE_FORMAT_VERSION, len(json_chunk)) + json_chunk)
+        f.write(b'\x00' * (-f.tell() % 8))
+        base = f.tell()
+        for offset, raw in chunks:
+            f.write(b'\x00' * (base + offset - f.tell()))
+            f.write(raw)
+    os.replace(temp_path, path)
+
+def load_model(path, use_mmap=True):
+    """
+    Read a model written by save_model without decoding model.1s again.
+
+    With use_mmap=True (on little-endian hosts) the geometry arrays are
+    memoryviews over a read-only mapping of the file, so loading costs only
+    the JSON header; the mapping stays open as long as a module uses it.
+    Otherwise the arrays are copied into typed arrays. A cache written with
+    another CACHE_FORMAT_VERSION or CONVERTER_FORMAT_VERSION raises
+    ValueError, the model.1s has to be parsed again.
+
+    Returns:
+        Model equal to the one that was saved
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                data = b''
+        else:
+            data = f.read()
+    if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError(f"{path} 不是模型缓存文件")
+    version, json_length = struct.unpack_from('<II', data, len(CACHE_MAGIC))
+    if version != CACHE_FORMAT_VERSION:
+        raise ValueError(f"不支持的模型缓存版本: {version}")
+    base = len(CACHE_MAGIC) + 8
+    header = json.loads(bytes(data[base:base + json_length]))
+    if header.get("converter_version") != CONVERTER_FORMAT_VERSION:
+        # 解码逻辑不同的转换器写出的缓存, 需要从model.1s重新生成
+        raise ValueError(f"模型缓存由不同的转换器版本生成: {header.get('converter_version')}")
+    base += json_length
+    base += -base % 8
+
+    view = memoryview(data)
+    map_arrays = use_mmap and sys.byteorder == 'little'
+    modules = []
+    for entry in header["modules"]:
+        module_info = module()
+        for name in _CACHE_FIELDS:
+            setattr(module_info, name, _as_tuples(entry[name]))
+        for name, typecode in _CACHE_ARRAYS:
+            offset, count = entry["arrays"][name]
+            chunk = view[base + offset:base + offset + count * array(typecode).itemsize]
+            setattr(module_info, name, chunk.cast(typecode) if map_arrays else _array_from_buffer(typecode, chunk))
+        modules.append(module_info)
+    return Model(modules, [tuple(item) for item in header["header_table"]])
+
+def export_files(model, output_format="obj", weld=False, lod_ratios=(), bounds=False):
+    """
+    Render a parsed model to output files in memory, without touching disk.
+
+    Args:
+        model: Model returned by parse_bytes
+        output_format: "obj", "merged" or "glb" (same as --format)
+        weld: merge duplicate vertices/UVs before writing (same as --weld)
+        lod_ratios: triangle ratios of the simplified levels to add (same as --lod)
+        bounds: add bounds.json with module bounds and the BVH (same as --bounds)
+
+    Returns:
+        Dict mapping output file names to their content as bytes
+    """
+    converter = Model1SToOBJ(output_format=output_format, weld=weld, lod_ratios=lod_ratios)
+    modules = [converter.weld_module(module_info) for module_info in model.modules] if weld else model.modules
+    lod_list = [converter.lod_modules(module_info) for module_info in modules] if lod_ratios else None
+    files = {}
+    if bounds:
+        content = converter.build_bounds([converter.module_bounds(module_info) for module_info in modules])
+        files["bounds.json"] = json.dumps(content, separators=(',', ':')).encode('utf-8')
+    if output_format == "glb":
+        files["model.glb"] = converter.build_glb(modules, lod_list)
+        return files
+
+    if output_format == "merged":
+        obj_file = io.StringIO()
+        converter._write_merged_header(obj_file)
+        for module_info in modules:
+            converter._write_merged_module(obj_file, module_info)
+        files["model.obj"] = obj_file.getvalue().encode('utf-8')
+    elif output_format == "obj":
+        for module_info in modules:
+            obj_file = io.StringIO()
+            converter._write_obj_module(obj_file, module_info)
+            files[f"{module_info.name}_{module_info.id}.obj"] = obj_file.getvalue().encode('utf-8')
+    else:
+        raise ValueError(f"未知的输出格式: {output_format}")
+    for module_info, levels in zip(modules, lod_list or ()):
+        for level, lod_module in enumerate(levels, 1):
+            obj_file = io.StringIO()
+            converter._write_obj_module(obj_file, lod_module)
+            files[f"{module_info.name}_{module_info.id}_lod{level}.obj"] = obj_file.getvalue().encode('utf-8')
+    files["test.mtl"] = mtl_content.encode('utf-8')
+    return files
+
+def export(model, output_format="glb"):
+    """
+    Render a parsed model to a single in-memory file.
+
+    Args:
+        model: Model returned by parse_bytes
+        output_format: "glb", "merged" (one OBJ with a group per module) or
+            "mtl"; use export_files for the per-module "obj" format
+
+    Returns:
+        The file content as bytes
+    """
+    if output_format == "mtl":
+        return mtl_content.encode('utf-8')
+    if output_format not in ("glb", "merged"):
+        raise ValueError(f"{output_format} 格式会生成多个文件, 请使用export_files")
+    files = export_files(model, output_format)
+    return files["model.glb" if output_format == "glb" else "model.obj"]
+
+def process_texture_bytes(file_name, data):
+    """Process one texture in memory; color-keyed textures are re-encoded as PNG."""
+    if file_name not in COLOR_KEY_TEXTURES:
+        return bytes(data)
+    output = io.BytesIO()
+    if not Model1SToOBJ().convert_magenta_to_transparent(io.BytesIO(data), output):
+        raise ValueError(f"处理贴图 {file_name} 失败")
+    return output.getvalue()
+
+def convert_files(files, output_format="obj", weld=False, lod_ratios=(), bounds=False):
+    """
+    Convert the input files of one vehicle held in memory.
+
+    Args:
+        files: dict mapping file names to bytes; must contain "model.1s",
+            textures are copied or color-keyed like the CLI does
+        other arguments: see export_files
+
+    Returns:
+        Dict mapping output file names (OBJ/MTL/GLB, textures) to bytes
+    """
+    if "model.1s" not in files:
+        raise ValueError("输入中没有model.1s")
+    outputs = export_files(parse_bytes(files["model.1s"]), output_format, weld, lod_ratios, bounds)
+    for file_name in REQUIRED_TEXTURES:
+        if file_name not in files:
+            logging.warning(f"{file_name} 未找到, 输出中将缺少该贴图")
+    for file_name, data in files.items():
+        if file_name.lower().endswith(TEXTURE_EXTENSIONS):
+            outputs[file_name] = process_texture_bytes(file_name, data)
+    return outputs
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ConversionManifest:
+    """
+    Content-hash manifest kept in the output directory for incremental runs.
+
+    Every input (model.1s and each texture) is recorded with its SHA-256 and
+    the output files generated from it. An input whose hash matches the
+    previous manifest and whose outputs still exist does not need to be
+    regenerated. A different CONVERTER_FORMAT_VERSION or different conversion
+    options (such as the output format) invalidate everything. On save, the
+    outputs the previous manifest listed that this run did not produce (other
+    format, dropped LOD levels, removed inputs) are deleted.
+    """
+    FILE_NAME = "manifest.json"
+
+    def __init__(self, output_path, previous=None, options=None, reuse=True):
+        self.output_path = output_path
+        self.options = options or {}
+        previous = previous or {}
+        # 旧的输入记录总是保留, 用于清理过期输出; 只有版本和选项都一致时才可跳过转换
+        self.previous_inputs = previous.get("inputs", {})
+        self.reusable = (reuse and previous.get("format_version") == CONVERTER_FORMAT_VERSION
+                         and previous.get("options", {}) == self.options)
+        self.inputs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, output_path, options=None, reuse=True):
+        """
+        Load the manifest from output_path (empty if missing or unreadable).
+
+        With reuse=False nothing is skipped, the previous manifest is only
+        used to remove outputs that are no longer produced.
+        """
+        manifest_path = os.path.join(output_path, cls.FILE_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.debug(f"未读取到manifest {manifest_path}: {e}")
+            previous = {}
+        return cls(output_path, previous, options, reuse)
+
+    def is_current(self, file_name, digest):
+        """Check whether file_name is unchanged and its outputs still exist."""
+        if not self.reusable:
+            return False
+        entry = self.previous_inputs.get(file_name)
+        if entry is None or entry.get("sha256") != digest:
+            return False
+        return all(os.path.exists(os.path.join(self.output_path, name))
+                   for name in entry.get("outputs", []))
+
+    def keep(self, file_name):
+        """Carry an unchanged input over from the previous manifest."""
+        with self._lock:
+            self.inputs[file_name] = self.previous_inputs[file_name]
+
+    def record(self, file_name, digest, outputs):
+        """Record a regenerated input."""
+        with self._lock:
+            self.inputs[file_name] = {"sha256": digest, "outputs": list(outputs)}
+
+    def prune(self):
+        """Remove the outputs of the previous manifest that this run did not produce."""
+        current = {name for entry in self.inputs.values() for name in entry.get("outputs", [])}
+        previous = {name for entry in self.previous_inputs.values() for name in entry.get("outputs", [])}
+        for name in sorted(previous - current):
+            stale_path = os.path.join(self.output_path, name)
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                logging.info(f"删除过期输出: {stale_path}")
+
+    def save(self):
+        """Remove stale outputs and atomically write the manifest into the output directory."""
+        self.prune()
+        manifest_path = os.path.join(self.output_path, self.FILE_NAME)
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"format_version": CONVERTER_FORMAT_VERSION,
+                       "options": self.options,
+                       "inputs": dict(sorted(self.inputs.items()))}, f, indent=2)
+        os.replace(temp_path, manifest_path)
+
+def setup_logging(debug=False):
+    """
+    Configure logging with an INFO log file and console output.
+
+    The DEBUG log file (and DEBUG level on the root logger) is only enabled
+    with debug=True, so hot-path debug tracing costs nothing otherwise.
+
+    Returns:
+        (log_dir, timestamp) used for the log file names
+    """
     # Get the directory where the script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
     log_dir = os.path.join(script_dir, 'log')
@@ -487,7 +2141,7 @@ def setup_logging():
 
     # Create root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)  # Capture all levels
+    root_logger.setLevel(logging.DEBUG if debug else logging.INFO)
 
     # Clear any existing handlers
     for handler in root_logger.handlers[:]:
@@ -501,11 +2155,12 @@ def setup_logging():
     root_logger.addHandler(info_handler)
 
     # Create DEBUG file handler
-    debug_file = os.path.join(log_dir, f'debug_{timestamp}.log')
-    debug_handler = logging.FileHandler(debug_file)
-    debug_handler.setLevel(logging.DEBUG)
-    debug_handler.setFormatter(formatter)
-    root_logger.addHandler(debug_handler)
+    if debug:
+        debug_file = os.path.join(log_dir, f'debug_{timestamp}.log')
+        debug_handler = logging.FileHandler(debug_file)
+        debug_handler.setLevel(logging.DEBUG)
+        debug_handler.setFormatter(formatter)
+        root_logger.addHandler(debug_handler)
 
     # Create console handler for INFO level
     console_handler = logging.StreamHandler()
@@ -513,16 +2168,75 @@ def setup_logging():
     console_handler.setFormatter(formatter)
     root_logger.addHandler(console_handler)
 
-    logging.info(f"Logging initialized. INFO log: {info_file}, DEBUG log: {debug_file}")
+    if debug:
+        logging.info(f"Logging initialized. INFO log: {info_file}, DEBUG log: {debug_file}")
+    else:
+        logging.info(f"Logging initialized. INFO log: {info_file}")
+    return log_dir, timestamp
+
+def _lod_ratio(value):
+    """argparse type for --lod: a triangle ratio between 0 and 1."""
+    ratio = float(value)
+    if not 0.0 < ratio < 1.0:
+        raise argparse.ArgumentTypeError(f"LOD ratio must be between 0 and 1: {value}")
+    return ratio
+
+def parse_arguments(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Convert KartRider model.1s files to OBJ.")
+    parser.add_argument("source", nargs="?",
+                        help="vehicle directory containing model.1s (or the root directory with --batch), "
+                             "or a zip/tar archive of vehicle directories")
+    parser.add_argument("--batch", action="store_true",
+                        help="convert every directory containing a model.1s under source")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes for --batch/--watch (default: CPU count)")
+    parser.add_argument("--output-zip", metavar="PATH",
+                        help="write all outputs into this zip archive instead of <dir>_module folders "
+                             "(default for archive input: <archive>_module.zip next to it)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and reconvert directories under source whose inputs change")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between polls of the inputs with --watch (default: 1.0)")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="seconds a directory must stay unchanged before --watch converts it (default: 2.0)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only regenerate outputs whose inputs changed since the last run")
+    parser.add_argument("--format", dest="output_format", choices=("obj", "merged", "glb"), default="obj",
+                        help="obj: one OBJ per module plus test.mtl; merged: one model.obj with a group "
+                             "per module; glb: a single binary glTF model.glb")
+    parser.add_argument("--weld", action="store_true",
+                        help="merge duplicate vertices/UVs and drop degenerate faces and unused vertices")
+    parser.add_argument("--lod", dest="lod_ratios", type=_lod_ratio, nargs="+", default=(), metavar="RATIO",
+                        help="also write simplified levels keeping about RATIO of the triangles each, "
+                             "e.g. --lod 0.5 0.25 (obj/merged: <name>_<id>_lod{n}.obj, glb: MSFT_lod)")
+    parser.add_argument("--bounds", action="store_true",
+                        help="write bounds.json with per-module boxes, spheres and centroids (before and "
+                             "after the module matrices) and a BVH over the modules")
+    parser.add_argument("--decode-workers", type=int, default=1,
+                        help="decode the modules of one model.1s on N processes sharing a mapping "
+                             "of the file (default: 1, sequential)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write OBJ files on writer threads while parsing and release each module "
+                             "once written (keeps memory flat on large files)")
+    parser.add_argument("--writer-threads", type=int, default=2,
+                        help="number of OBJ writer threads for --stream (default: 2)")
+    parser.add_argument("--debug", action="store_true",
+                        help="write detailed parser tracing to log/debug_<timestamp>.log")
+    parser.add_argument("--profile", action="store_true",
+                        help="record per-stage timings and counters to log/profile_<timestamp>.json")
+    return parser.parse_args(argv)
 
 def get_source_directory(args):
     """Get source directory from command line arguments or file dialog."""
-    if len(args) < 2:
+    if args.source is None:
+        # tkinter只在需要选择目录对话框时才导入
+        from tkinter import Tk, filedialog
         root = Tk()
         root.withdraw()
         source_dir = filedialog.askdirectory(title="选择源目录")
     else:
-        source_dir = args[1]
+        source_dir = args.source
         print(f"目标目录: {source_dir}")
         source_dir = os.path.abspath(source_dir)
         if not os.path.exists(source_dir):
@@ -538,32 +2252,51 @@ def prepare_output_directory(source_dir):
         os.makedirs(output_path)
     return output_path
 
-def process_texture_files(source_dir, output_path, converter):
-    """Copy and process texture files to output directory."""
-    file_names = ["0.png", "1.png"]
-    all_files_found = True
-
-    for file_name in file_names:
-        file_path = os.path.join(source_dir, file_name)
-        if os.path.exists(file_path):
-            try:
-                output_file_path = os.path.join(output_path, file_name)
-                # Convert magenta to transparent for 1.png
-                if file_name == "1.png":
-                    converter.convert_magenta_to_transparent(file_path, output_file_path)
-                    print(f"成功将 {file_name} 处理并保存到 {output_path}，洋红色已转换为透明")
-                else:
-                    # Just copy other files
-                    shutil.copy(file_path, output_file_path)
-                    print(f"成功将 {file_name} 复制到 {output_path}")
-            except Exception as e:
-                print(f"处理 {file_name} 时出错: {e}")
-                all_files_found = False
-        else:
-            print(f"{file_name} 在 {source_dir} 中未找到。")
-            all_files_found = False
-
-    return all_files_found
+def find_texture_files(source_dir):
+    """List the texture files in source_dir, required textures first."""
+    textures = [name for name in sorted(os.listdir(source_dir))
+                if name.lower().endswith(TEXTURE_EXTENSIONS) and name not in REQUIRED_TEXTURES]
+    return list(REQUIRED_TEXTURES) + textures
+
+def process_texture_file(source_dir, output_path, file_name, converter, manifest=None):
+    """Copy or color-key a single texture file into the output directory."""
+    file_path = os.path.join(source_dir, file_name)
+    if not os.path.exists(file_path):
+        print(f"{file_name} 在 {source_dir} 中未找到。")
+        return False
+    try:
+        if manifest is not None:
+            digest = hash_file(file_path)
+            if manifest.is_current(file_name, digest):
+                manifest.keep(file_name)
+                print(f"{file_name} 未变化，跳过")
+                return True
+        output_file_path = os.path.join(output_path, file_name)
+        with converter.profile.stage("texture", files=1, bytes=os.path.getsize(file_path)):
+            # Convert magenta to transparent for 1.png
+            if file_name in COLOR_KEY_TEXTURES:
+                if not converter.convert_magenta_to_transparent(file_path, output_file_path):
+                    return False
+                print(f"成功将 {file_name} 处理并保存到 {output_path}，洋红色已转换为透明")
+            else:
+                # Just copy other files
+                shutil.copy(file_path, output_file_path)
+                print(f"成功将 {file_name} 复制到 {output_path}")
+        if manifest is not None:
+            manifest.record(file_name, digest, [file_name])
+    except Exception as e:
+        print(f"处理 {file_name} 时出错: {e}")
+        return False
+    return True
+
+def process_texture_files(source_dir, output_path, converter, manifest=None, max_workers=None):
+    """Copy and process every texture file to output directory on a thread pool."""
+    file_names = find_texture_files(source_dir)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda file_name: process_texture_file(source_dir, output_path, file_name, converter, manifest),
+            file_names))
+    return all(results)
 
 def find_model_file(source_dir):
     """Find and verify the model.1s file exists."""
@@ -575,34 +2308,418 @@ def find_model_file(source_dir):
         logging.info(f"未找到model.1s文件")
         return None
 
-def main():
-    """Main entry point for the application."""
-    setup_logging()
-
-    # Get source directory
-    source_dir = get_source_directory(sys.argv)
-
+def convert_directory(source_dir, incremental=False, output_format="obj", profile=None,
+                      streaming=False, writer_threads=2, weld=False, lod_ratios=(), bounds=False,
+                      decode_workers=1):
+    """
+    Convert one vehicle directory into its <dir>_module output directory.
+
+    A manifest of input hashes is always written and outputs of the previous
+    run that this one did not produce are removed; with incremental=True the
+    previous manifest is also used to skip inputs that have not changed.
+    streaming/writer_threads/weld/lod_ratios/bounds/decode_workers are passed to
+    Model1SToOBJ (see --stream, --weld, --lod, --bounds, --decode-workers).
+    """
     # Prepare output directory
     output_path = prepare_output_directory(source_dir)
+    options = {"format": output_format}
+    if weld:
+        options["weld"] = True
+    if lod_ratios:
+        options["lod"] = list(lod_ratios)
+    if bounds:
+        options["bounds"] = True
+    # 非增量模式也读取旧manifest, 以便删除不再生成的输出
+    manifest = ConversionManifest.load(output_path, options, reuse=incremental)
 
     # Create converter instance
-    converter = Model1SToOBJ()
+    converter = Model1SToOBJ(output_format=output_format, profile=profile,
+                             streaming=streaming, writer_threads=writer_threads, weld=weld,
+                             lod_ratios=lod_ratios, bounds=bounds, decode_workers=decode_workers)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Process texture files in the background while the model is parsed
+        textures = executor.submit(process_texture_files, source_dir, output_path, converter, manifest)
+
+        # Find and verify model file
+        model_file_path = find_model_file(source_dir)
+        if model_file_path:
+            digest = hash_file(model_file_path)
+            if manifest.is_current("model.1s", digest):
+                manifest.keep("model.1s")
+                logging.info(f"model.1s 未变化，跳过转换")
+            else:
+                # Continue with conversion even if textures fail, as the model structure can still be useful
+                converter.convert(model_file_path, output_path)
+                manifest.record("model.1s", digest, converter.output_files)
+
+        if not textures.result():
+            logging.warning("Some texture files were missing or failed to process. Conversion may be incomplete.")
+
+    manifest.save()
+    return model_file_path is not None
+
+def find_model_directories(root_dir):
+    """Walk root_dir and return every directory that contains a model.1s."""
+    model_dirs = []
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        # 跳过本工具生成的输出目录
+        output_name = os.path.basename(dir_path) + "_module"
+        dir_names[:] = sorted(name for name in dir_names if name != output_name)
+        if "model.1s" in file_names:
+            model_dirs.append(dir_path)
+    return model_dirs
+
+def _is_input_file(file_name):
+    return file_name == "model.1s" or file_name.lower().endswith(TEXTURE_EXTENSIONS)
+
+def read_directory_inputs(source_dir):
+    """Read model.1s and the textures of a vehicle directory into a {file name: bytes} dict."""
+    files = {}
+    for file_name in sorted(os.listdir(source_dir)):
+        file_path = os.path.join(source_dir, file_name)
+        if _is_input_file(file_name) and os.path.isfile(file_path):
+            with open(file_path, 'rb') as f:
+                files[file_name] = f.read()
+    return files
+
+def is_archive(path):
+    """True for a zip or tar (optionally gz/bz2/xz compressed) file."""
+    return os.path.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+def archive_stem(path):
+    """Archive file name without its archive extensions (kart.tar.gz -> kart)."""
+    name = os.path.basename(path)
+    for suffix in (".zip", ".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tar.xz"):
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+def _group_archive_entries(paths):
+    """Group archive member paths into [(vehicle directory, {file name: member path})] in archive order."""
+    vehicles = {}
+    for path in paths:
+        path = posixpath.normpath(path.replace('\\', '/')).lstrip('/')
+        if path.startswith('../'):
+            continue
+        dir_name, file_name = posixpath.split(path)
+        if _is_input_file(file_name):
+            vehicles.setdefault(dir_name, {})[file_name] = path
+    return [(dir_name, entries) for dir_name, entries in vehicles.items() if "model.1s" in entries]
+
+def iter_archive_inputs(archive_path):
+    """
+    Yield (vehicle directory, {file name: bytes}) for every directory of a
+    zip/tar archive that contains a model.1s, reading the entries straight
+    into memory. Vehicles are read one at a time in archive order; a
+    model.1s at the archive root is named after the archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        archive = zipfile.ZipFile(archive_path)
+        members = {info.filename: info for info in archive.infolist() if not info.is_dir()}
+        read = lambda name: archive.read(members[name])
+    else:
+        archive = tarfile.open(archive_path)
+        members = {member.name: member for member in archive.getmembers() if member.isfile()}
+        read = lambda name: archive.extractfile(members[name]).read()
+    # 成员名规范化后再分组, 读取时仍使用原始名称
+    originals = {posixpath.normpath(name.replace('\\', '/')).lstrip('/'): name for name in members}
+    with archive:
+        for dir_name, entries in _group_archive_entries(members):
+            files = {file_name: read(originals[path]) for file_name, path in entries.items()}
+            yield dir_name or archive_stem(archive_path), files
+
+def _convert_files_job(vehicle, files, output_format="obj", weld=False, lod_ratios=(), bounds=False):
+    """Worker entry for convert_to_zip: (vehicle, outputs or None, seconds, error)."""
+    start = time.perf_counter()
+    try:
+        outputs = convert_files(files, output_format, weld, lod_ratios, bounds)
+        error = None
+    except Exception as e:
+        outputs = None
+        error = f"{type(e).__name__}: {e}"
+    return vehicle, outputs, time.perf_counter() - start, error
+
+def convert_to_zip(vehicles, zip_path, workers=None, output_format="obj", weld=False, lod_ratios=(),
+                   bounds=False):
+    """
+    Convert vehicles held in memory and write every output into one zip archive.
+
+    Each vehicle's outputs are stored under <vehicle>/<name>_module/, the same
+    layout the directory mode creates on disk, and no intermediate files are
+    written. At most 2 * workers vehicles are read ahead, so memory stays
+    bounded however many vehicles the input holds. The archive is written
+    to a temporary file and moved into place when complete.
+
+    Args:
+        vehicles: iterable of (vehicle path, {file name: bytes}), e.g. from
+            iter_archive_inputs or read_directory_inputs
+        zip_path: Output zip archive
+        workers: Number of worker processes (None uses the CPU count)
+        other arguments: see export_files
+
+    Returns:
+        List of (vehicle, ok, seconds, error) tuples in input order
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    order = []
+    results = {}
+    temp_path = zip_path + ".tmp"
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor, \
+                zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            running = set()
+            vehicles = iter(vehicles)
+            while True:
+                for vehicle, files in vehicles:
+                    order.append(vehicle)
+                    running.add(executor.submit(_convert_files_job, vehicle, files, output_format, weld,
+                                                lod_ratios, bounds))
+                    if len(running) >= 2 * workers:
+                        break
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    vehicle, outputs, seconds, error = future.result()
+                    results[vehicle] = (vehicle, outputs is not None, seconds, error)
+                    if outputs is None:
+                        logging.error(f"[{len(results)}] 失败 {vehicle} ({seconds:.2f}s): {error}")
+                        continue
+                    output_dir = posixpath.join(vehicle, posixpath.basename(vehicle) + "_module")
+                    for file_name, data in outputs.items():
+                        zip_file.writestr(posixpath.join(output_dir, file_name), data)
+                    logging.info(f"[{len(results)}] 完成 {vehicle}: {len(outputs)} 个文件 ({seconds:.2f}s)")
+        os.replace(temp_path, zip_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    results = [results[vehicle] for vehicle in order]
+    failures = sum(1 for result in results if not result[1])
+    logging.info(f"已写入 {zip_path}: 成功 {len(results) - failures}, 失败 {failures}, "
+                 f"总耗时 {time.perf_counter() - start:.2f}s")
+    return results
+
+def _convert_batch_job(source_dir, incremental=False, output_format="obj", profiling=False,
+                       streaming=False, writer_threads=2, weld=False, lod_ratios=(), bounds=False,
+                       decode_workers=1):
+    """Worker entry for convert_batch: (source_dir, ok, seconds, error, profile dict or None)."""
+    start = time.perf_counter()
+    profile = ConversionProfile() if profiling else None
+    try:
+        ok = convert_directory(source_dir, incremental, output_format, profile, streaming, writer_threads,
+                               weld, lod_ratios, bounds, decode_workers)
+        error = None if ok else "model.1s not found"
+    except Exception as e:
+        ok = False
+        error = f"{type(e).__name__}: {e}"
+    return source_dir, ok, time.perf_counter() - start, error, profile and profile.to_dict()
+
+def convert_batch(root_dir, workers=None, incremental=False, output_format="obj", profile=None,
+                  streaming=False, writer_threads=2, weld=False, lod_ratios=(), bounds=False,
+                  decode_workers=1):
+    """
+    Convert every vehicle directory under root_dir on a process pool.
+
+    Args:
+        root_dir: Root directory to search for model.1s files
+        workers: Number of worker processes (None uses the CPU count)
+        incremental: Skip inputs whose manifest hashes are unchanged
+        output_format: "obj", "merged" or "glb"
+        profile: ConversionProfile that collects the stages of every job
+        streaming: Write OBJ files on writer threads while parsing (see --stream)
+        writer_threads: Number of writer threads per job in streaming mode
+        weld: Merge duplicate vertices/UVs before writing (see --weld)
+        lod_ratios: Triangle ratios of the simplified levels to write (see --lod)
+        bounds: Write bounds.json with module bounds and a BVH (see --bounds)
+        decode_workers: Decoding processes per model.1s (see --decode-workers)
+
+    Returns:
+        List of (source_dir, ok, seconds, error) tuples in directory order
+    """
+    model_dirs = find_model_directories(root_dir)
+    logging.info(f"批量转换: 在 {root_dir} 下找到 {len(model_dirs)} 个模型目录")
+
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_convert_batch_job, model_dir, incremental, output_format,
+                                   profile is not None, streaming, writer_threads, weld, lod_ratios,
+                                   bounds, decode_workers)
+                   for model_dir in model_dirs]
+        for future in as_completed(futures):
+            source_dir, ok, seconds, error, job_profile = future.result()
+            if job_profile is not None:
+                profile.merge(job_profile)
+            results[source_dir] = (source_dir, ok, seconds, error)
+            if ok:
+                logging.info(f"[{len(results)}/{len(model_dirs)}] 完成 {source_dir} ({seconds:.2f}s)")
+            else:
+                logging.error(f"[{len(results)}/{len(model_dirs)}] 失败 {source_dir} ({seconds:.2f}s): {error}")
+    elapsed = time.perf_counter() - start
+
+    results = [results[model_dir] for model_dir in model_dirs]
+    failures = [result for result in results if not result[1]]
+    job_seconds = sum(result[2] for result in results)
+    logging.info(f"批量转换完成: 成功 {len(results) - len(failures)}, 失败 {len(failures)}, "
+                 f"总耗时 {elapsed:.2f}s, 累计任务耗时 {job_seconds:.2f}s")
+    if results:
+        slowest = max(results, key=lambda result: result[2])
+        logging.info(f"最慢任务: {slowest[0]} ({slowest[2]:.2f}s)")
+    for source_dir, _, _, error in failures:
+        logging.info(f"失败: {source_dir}: {error}")
+    return results
+
+def snapshot_directory(source_dir):
+    """(name, mtime_ns, size) of the inputs of a vehicle directory: model.1s and the textures."""
+    snapshot = []
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and (entry.name == "model.1s" or entry.name.lower().endswith(TEXTURE_EXTENSIONS)):
+                stat = entry.stat()
+                snapshot.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(snapshot))
+
+def watch_directories(root_dir, workers=None, interval=1.0, debounce=2.0, output_format="obj", profile=None,
+                      streaming=False, writer_threads=2, weld=False, lod_ratios=(), bounds=False,
+                      decode_workers=1, stop=None):
+    """
+    Keep converting the vehicle directories under root_dir as their inputs change.
+
+    Every `interval` seconds the directories containing a model.1s are listed
+    and the mtime/size of their inputs compared with the previous poll. A
+    changed directory is converted once it has been quiet for `debounce`
+    seconds, so a folder still being extracted is not picked up half written.
+    At most `workers` jobs are submitted to the process pool at a time; a
+    directory that changes while it is converting is queued again. Jobs run
+    incrementally, so only the inputs that changed are regenerated. All
+    directories are checked once at startup.
+
+    Args:
+        root_dir: Root directory to watch (a single vehicle directory also works)
+        stop: threading.Event that ends the loop; None watches until Ctrl+C
+        other arguments: see convert_batch
+
+    Returns:
+        (completed jobs, failed jobs); per-job results are only logged, so
+        memory does not grow however long the watch runs
+    """
+    stop = stop or threading.Event()
+    workers = workers or os.cpu_count() or 1
+    snapshots = {}
+    pending = {}   # 目录 -> (首次发现变化的时间, 最后一次变化的时间)
+    running = {}   # future -> (目录, 首次发现变化的时间)
+    completed = failed = 0
+    last_status = None
+    logging.info(f"监视模式: {root_dir} (轮询 {interval}s, 防抖 {debounce}s, 工作进程 {workers})")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                now = time.monotonic()
+                current = {}
+                for model_dir in find_model_directories(root_dir):
+                    try:
+                        current[model_dir] = snapshot_directory(model_dir)
+                    except OSError:
+                        # 目录在轮询过程中被删除或移动, 下次轮询再处理
+                        continue
+                for model_dir, snapshot in current.items():
+                    if snapshots.get(model_dir) != snapshot:
+                        first_seen = pending.get(model_dir, (now, now))[0]
+                        pending[model_dir] = (first_seen, now)
+                for model_dir in snapshots.keys() - current.keys():
+                    pending.pop(model_dir, None)
+                snapshots = current
+
+                for future in [future for future in running if future.done()]:
+                    model_dir, first_seen = running.pop(future)
+                    source_dir, ok, seconds, error, job_profile = future.result()
+                    if job_profile is not None:
+                        profile.merge(job_profile)
+                    completed += 1
+                    failed += not ok
+                    latency = time.monotonic() - first_seen
+                    if ok:
+                        logging.info(f"完成 {source_dir} (转换 {seconds:.2f}s, 从发现变化起 {latency:.2f}s)")
+                    else:
+                        logging.error(f"失败 {source_dir} (转换 {seconds:.2f}s, 从发现变化起 {latency:.2f}s): {error}")
+
+                busy = {model_dir for model_dir, _ in running.values()}
+                for model_dir, (first_seen, last_change) in sorted(pending.items(), key=lambda item: item[1]):
+                    if len(running) >= workers:
+                        break
+                    if model_dir in busy or now - last_change < debounce:
+                        continue
+                    del pending[model_dir]
+                    future = executor.submit(_convert_batch_job, model_dir, True, output_format,
+                                             profile is not None, streaming, writer_threads, weld, lod_ratios,
+                                             bounds, decode_workers)
+                    running[future] = (model_dir, first_seen)
+
+                status = (len(pending), len(running), completed)
+                if status != last_status:
+                    logging.info(f"队列: 等待 {status[0]}, 转换中 {status[1]}, 已完成 {status[2]} (失败 {failed})")
+                    last_status = status
+                if stop.wait(interval):
+                    break
+        except KeyboardInterrupt:
+            logging.info("监视模式已停止, 等待正在进行的转换完成")
+    return completed, failed
+
+def write_profile(profile, profile_path):
+    """Write the collected profile as JSON."""
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        json.dump(profile.to_dict(), f, indent=2)
+    logging.info(f"Profile written to {profile_path}")
 
-    # Process texture files
-    textures_ok = process_texture_files(source_dir, output_path, converter)
+def main():
+    """Main entry point for the application."""
+    args = parse_arguments(sys.argv[1:])
+    log_dir, timestamp = setup_logging(args.debug)
+    profile = ConversionProfile() if args.profile else None
 
-    # Find and verify model file
-    model_file_path = find_model_file(source_dir)
-    if not model_file_path:
-        sys.exit(1)
+    # Get source directory
+    source_dir = get_source_directory(args)
+
+    source_is_archive = is_archive(source_dir)
+    if args.watch and (source_is_archive or args.output_zip):
+        logging.error("--watch 只能监视目录, 不能与压缩包输入或 --output-zip 同时使用")
+        sys.exit(2)
 
-    # Convert model if everything is ready
-    if textures_ok:
-        converter.convert(model_file_path, output_path)
+    if source_is_archive or args.output_zip:
+        if source_is_archive:
+            vehicles = iter_archive_inputs(source_dir)
+        else:
+            model_dirs = find_model_directories(source_dir) if args.batch else [source_dir]
+            vehicles = ((os.path.relpath(model_dir, os.path.dirname(source_dir)).replace(os.sep, '/'),
+                         read_directory_inputs(model_dir)) for model_dir in model_dirs)
+        output_zip = args.output_zip or os.path.join(os.path.dirname(source_dir),
+                                                     archive_stem(source_dir) + "_module.zip")
+        results = convert_to_zip(vehicles, os.path.abspath(output_zip), args.workers, args.output_format,
+                                 args.weld, args.lod_ratios, args.bounds)
+        ok = bool(results) and all(result[1] for result in results)
+    elif args.watch:
+        _, failed = watch_directories(source_dir, args.workers, args.interval, args.debounce, args.output_format,
+                                      profile, args.stream, args.writer_threads, args.weld, args.lod_ratios,
+                                      args.bounds, args.decode_workers)
+        ok = failed == 0
+    elif args.batch:
+        results = convert_batch(source_dir, args.workers, args.incremental, args.output_format, profile,
+                                args.stream, args.writer_threads, args.weld, args.lod_ratios, args.bounds,
+                                args.decode_workers)
+        ok = all(result[1] for result in results)
     else:
-        logging.warning("Some texture files were missing or failed to process. Conversion may be incomplete.")
-        # Continue with conversion anyway, as the model structure can still be useful
-        converter.convert(model_file_path, output_path)
+        ok = convert_directory(source_dir, args.incremental, args.output_format, profile,
+                               args.stream, args.writer_threads, args.weld, args.lod_ratios, args.bounds,
+                               args.decode_workers)
+
+    if profile is not None:
+        write_profile(profile, os.path.join(log_dir, f'profile_{timestamp}.json'))
+    if not ok:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()